@@ -4,14 +4,22 @@
 """
 import sys
 import os
+from functools import lru_cache
 from pathlib import Path
+from typing import Dict, Optional
 from dotenv import load_dotenv
 
 
+# Снимок переменных окружения, обновляется при каждой загрузке .env
+_ENV_SNAPSHOT: Dict[str, str] = {}
+
+
+@lru_cache(maxsize=1)
 def get_app_data_dir() -> Path:
     """
     Получить путь к папке данных приложения в пользовательской директории.
     Используется для хранения файлов, которые требуют записи (БД, логи, настройки).
+    Путь вычисляется (и папка создается) один раз за время работы процесса.
     
     Returns:
         Path к папке данных приложения
@@ -50,10 +58,29 @@ def load_env_file():
     for env_path in env_paths:
         if env_path.exists():
             load_dotenv(dotenv_path=str(env_path), override=True)
-            return
+            break
+    else:
+        # Если .env не найден, загружаем из текущей директории (стандартное поведение)
+        load_dotenv()
     
-    # Если .env не найден, загружаем из текущей директории (стандартное поведение)
-    load_dotenv()
+    # Обновляем снимок переменных окружения
+    _ENV_SNAPSHOT.clear()
+    _ENV_SNAPSHOT.update(os.environ)
+
+
+def get_env(name: str, default: Optional[str] = None) -> Optional[str]:
+    """
+    Получить значение переменной окружения из снимка, сделанного в load_env_file.
+    Быстрее os.getenv: обычный словарь без перекодирования ключей и значений.
+    
+    Args:
+        name: Имя переменной окружения
+        default: Значение по умолчанию
+        
+    Returns:
+        Значение переменной или default
+    """
+    return _ENV_SNAPSHOT.get(name, default)
 
 
 # Автоматически загружаем .env при импорте модуля
@@ -6,12 +6,15 @@ import sqlite3
 import os
 import threading
 from datetime import datetime
-from typing import List, Dict, Optional, Tuple
+from typing import Callable, List, Dict, Iterator, Optional, Tuple
 
 
 class Database:
     """Класс для работы с базой данных SQLite (thread-safe)."""
     
+    # Максимальное число параметров в одном запросе (лимит SQLite по умолчанию - 999)
+    MAX_SQL_PARAMS = 900
+    
     def __init__(self, db_path: str = "chatlist.db"):
         """
         Инициализация подключения к БД.
@@ -21,6 +24,12 @@ class Database:
         """
         self.db_path = db_path
         self._local = threading.local()  # Локальное хранилище для каждого потока
+        # Кэш промтов и моделей по ID (см. get_prompts_cached), общий для потоков.
+        # Поколение увеличивается при каждом сбросе, чтобы загрузка, начатая
+        # до изменения, не сохранила устаревшие данные
+        self._cache: Dict[str, Dict[int, Dict]] = {}
+        self._cache_generation = 0
+        self._cache_lock = threading.Lock()
         self.init_db()
     
     def get_connection(self):
@@ -118,6 +127,63 @@ class Database:
         
         conn.commit()
     
+    # ========== Кэш справочников ==========
+    
+    def _get_cached(self, key: str, load: Callable[[], Dict[int, Dict]]) -> Dict[int, Dict]:
+        """
+        Получить данные из кэша, загрузив их при первом обращении.
+        
+        Args:
+            key: Имя кэшируемого набора
+            load: Функция загрузки данных из БД
+            
+        Returns:
+            Словарь {ID: словарь с данными}
+        """
+        with self._cache_lock:
+            cached = self._cache.get(key)
+            generation = self._cache_generation
+        if cached is None:
+            cached = load()
+            with self._cache_lock:
+                if generation == self._cache_generation:
+                    self._cache[key] = cached
+        return cached
+    
+    def _invalidate_cache(self, key: str):
+        """Сбросить кэш набора после изменения данных."""
+        with self._cache_lock:
+            self._cache.pop(key, None)
+            self._cache_generation += 1
+    
+    def get_prompts_cached(self) -> Dict[int, Dict]:
+        """
+        Получить все промты по ID (в порядке от новых к старым) с кэшированием.
+        Кэш сбрасывается при создании, изменении и удалении промтов.
+        Возвращаемый словарь общий для всех вызовов - его нельзя изменять.
+        
+        Returns:
+            Словарь {ID промта: словарь с данными промта}
+        """
+        return self._get_cached(
+            'prompts',
+            lambda: {p['id']: p for p in self.get_prompts(order_by="date DESC")}
+        )
+    
+    def get_models_cached(self) -> Dict[int, Dict]:
+        """
+        Получить все модели по ID (в порядке названий) с кэшированием.
+        Кэш сбрасывается при создании, изменении и удалении моделей.
+        Возвращаемый словарь общий для всех вызовов - его нельзя изменять.
+        
+        Returns:
+            Словарь {ID модели: словарь с данными модели}
+        """
+        return self._get_cached(
+            'models',
+            lambda: {m['id']: m for m in self.get_models(order_by="name ASC")}
+        )
+    
     # ========== Методы для работы с промтами ==========
     
     def create_prompt(self, prompt: str, tags: Optional[str] = None) -> int:
@@ -139,6 +205,7 @@ class Database:
             (date, prompt, tags)
         )
         conn.commit()
+        self._invalidate_cache('prompts')
         return cursor.lastrowid
     
     def get_prompts(self, search: Optional[str] = None, 
@@ -225,6 +292,7 @@ class Database:
         query = f"UPDATE prompts SET {', '.join(updates)} WHERE id = ?"
         cursor.execute(query, params)
         conn.commit()
+        self._invalidate_cache('prompts')
         return cursor.rowcount > 0
     
     def delete_prompt(self, prompt_id: int) -> bool:
@@ -241,6 +309,7 @@ class Database:
         cursor = conn.cursor()
         cursor.execute("DELETE FROM prompts WHERE id = ?", (prompt_id,))
         conn.commit()
+        self._invalidate_cache('prompts')
         return cursor.rowcount > 0
     
     # ========== Методы для работы с моделями ==========
@@ -266,6 +335,7 @@ class Database:
             (name, api_url, api_id, is_active)
         )
         conn.commit()
+        self._invalidate_cache('models')
         return cursor.lastrowid
     
     def get_models(self, search: Optional[str] = None,
@@ -309,6 +379,18 @@ class Database:
         rows = cursor.fetchall()
         return [dict(row) for row in rows]
     
+    def iter_active_models(self) -> Iterator[Dict]:
+        """
+        Построчно перебрать активные модели без загрузки всего списка.
+        
+        Yields:
+            Словари с данными активных моделей
+        """
+        conn = self.get_connection()
+        cursor = conn.execute("SELECT * FROM models WHERE is_active = 1 ORDER BY name ASC")
+        for row in cursor:
+            yield dict(row)
+    
     def get_model(self, model_id: int) -> Optional[Dict]:
         """
         Получить модель по ID.
@@ -370,8 +452,32 @@ class Database:
         query = f"UPDATE models SET {', '.join(updates)} WHERE id = ?"
         cursor.execute(query, params)
         conn.commit()
+        self._invalidate_cache('models')
         return cursor.rowcount > 0
     
+    def bulk_update_active(self, updates: Dict[int, int]) -> int:
+        """
+        Обновить флаги активности нескольких моделей одной транзакцией.
+        
+        Args:
+            updates: Словарь {ID модели: флаг активности (1 или 0)}
+            
+        Returns:
+            Количество обновленных записей
+        """
+        if not updates:
+            return 0
+        
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.executemany(
+            "UPDATE models SET is_active = ? WHERE id = ?",
+            [(is_active, model_id) for model_id, is_active in updates.items()]
+        )
+        conn.commit()
+        self._invalidate_cache('models')
+        return cursor.rowcount
+    
     def delete_model(self, model_id: int) -> bool:
         """
         Удалить модель.
@@ -386,6 +492,7 @@ class Database:
         cursor = conn.cursor()
         cursor.execute("DELETE FROM models WHERE id = ?", (model_id,))
         conn.commit()
+        self._invalidate_cache('models')
         return cursor.rowcount > 0
     
     # ========== Методы для работы с результатами ==========
@@ -476,6 +583,36 @@ class Database:
         conn.commit()
         return cursor.rowcount > 0
     
+    def delete_results(self, result_ids: List[int]) -> int:
+        """
+        Удалить несколько результатов одной транзакцией.
+        
+        Args:
+            result_ids: Список ID результатов
+            
+        Returns:
+            Количество удаленных записей
+        """
+        ids = list(dict.fromkeys(result_ids))
+        if not ids:
+            return 0
+        
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        deleted = 0
+        try:
+            # Разбиваем на части, чтобы не превысить лимит параметров SQLite
+            for start in range(0, len(ids), self.MAX_SQL_PARAMS):
+                chunk = ids[start:start + self.MAX_SQL_PARAMS]
+                placeholders = ", ".join("?" * len(chunk))
+                cursor.execute(f"DELETE FROM results WHERE id IN ({placeholders})", chunk)
+                deleted += cursor.rowcount
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        return deleted
+    
     # ========== Методы для работы с настройками ==========
     
     def get_setting(self, key: str, default: Optional[str] = None) -> Optional[str]:
@@ -515,6 +652,40 @@ class Database:
         conn.commit()
         return True
     
+    def get_all_settings(self) -> Dict[str, str]:
+        """
+        Получить все настройки одним запросом.
+        
+        Returns:
+            Словарь {ключ: значение}
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute("SELECT key, value FROM settings")
+        return {row['key']: row['value'] for row in cursor.fetchall()}
+    
+    def set_settings(self, values: Dict[str, str]) -> bool:
+        """
+        Установить несколько настроек одной транзакцией.
+        
+        Args:
+            values: Словарь {ключ: значение}
+            
+        Returns:
+            True если установка успешна
+        """
+        if not values:
+            return True
+        
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.executemany(
+            "INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)",
+            list(values.items())
+        )
+        conn.commit()
+        return True
+    
     def close(self):
         """Закрыть соединение с БД (для текущего потока)."""
         if hasattr(self._local, 'conn') and self._local.conn:
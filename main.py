@@ -633,8 +633,11 @@ class MainWindow(QMainWindow):
     def apply_settings(self):
         """Применить настройки темы и размера шрифта."""
         try:
+            # Все настройки читаются одним запросом
+            settings = self.db.get_all_settings()
+            
             # Загружаем тему
-            theme = self.db.get_setting("theme", "light")
+            theme = settings.get("theme") or "light"
             
             # Применяем тему
             if theme == "dark":
@@ -645,7 +648,7 @@ class MainWindow(QMainWindow):
                 self.apply_light_theme()
             
             # Загружаем и применяем размер шрифта
-            font_size_str = self.db.get_setting("font_size", "10")
+            font_size_str = settings.get("font_size") or "10"
             try:
                 font_size = int(font_size_str)
                 if 8 <= font_size <= 20:  # Ограничение согласно диалогу настроек
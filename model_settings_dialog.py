@@ -3,17 +3,43 @@
 Позволяет добавлять, редактировать, удалять и включать/отключать модели.
 """
 import os
+import re
 from PyQt5.QtWidgets import (
     QDialog, QVBoxLayout, QHBoxLayout, QPushButton, QTableWidget,
     QTableWidgetItem, QHeaderView, QMessageBox, QLineEdit, QLabel,
     QCheckBox, QDialogButtonBox, QWidget, QTextEdit
 )
-from PyQt5.QtCore import Qt
+from PyQt5.QtCore import Qt, QSignalBlocker
 from db import Database
 # Импортируем config для автоматической загрузки .env из правильной папки
 import config  # noqa: F401
 
 
+# Подстроки, по которым значение API-ключа распознается как заглушка
+_PLACEHOLDERS = ('sk-your-', 'gsk_your-', 'sk-or-your-', 'your-api-key', 'api-key-here')
+_PLACEHOLDER_RE = re.compile('|'.join(map(re.escape, _PLACEHOLDERS)), re.IGNORECASE)
+
+# Тексты сообщений валидации
+_TITLE_ERR = "Ошибка"
+_ERR_NAME = "Введите название модели!"
+_ERR_URL = "Введите API URL!"
+_ERR_API_ID = "Введите имя переменной окружения!"
+_ERR_URL_SCHEME = "API URL должен начинаться с http:// или https://"
+_ENV_MISSING_TMPL = (
+    "API ключ не найден!\n\n"
+    "Переменная окружения '{api_id}' не найдена в файле .env.\n\n"
+    "Проверьте:\n"
+    "1. Файл .env существует в корне проекта\n"
+    "2. В файле .env есть строка: {api_id}=ваш_ключ\n"
+    "3. Ключ не является заглушкой"
+)
+_PLACEHOLDER_FOUND_TMPL = (
+    "Обнаружена заглушка вместо реального ключа!\n\n"
+    "Значение переменной '{api_id}' похоже на заглушку.\n"
+    "Замените её на реальный API-ключ в файле .env"
+)
+
+
 class ModelSettingsDialog(QDialog):
     """Диалог для управления моделями."""
     
@@ -27,6 +53,8 @@ class ModelSettingsDialog(QDialog):
         """
         super().__init__(parent)
         self.db = db
+        # Несохраненные изменения активности {ID модели: is_active}
+        self._dirty_active = {}
         self.setWindowTitle("Управление моделями")
         self.setMinimumSize(800, 600)
         
@@ -81,58 +109,73 @@ class ModelSettingsDialog(QDialog):
     def load_models(self):
         """Загрузить список моделей из БД."""
         models = self.db.get_models()
-        self.models_table.setRowCount(len(models))
-        
-        for row, model in enumerate(models):
-            # Чекбокс активности
-            checkbox = QCheckBox()
-            checkbox.setChecked(model['is_active'] == 1)
-            checkbox.stateChanged.connect(
-                lambda state, m_id=model['id']: self.toggle_model_active(m_id, state)
-            )
-            self.models_table.setCellWidget(row, 0, checkbox)
+        
+        # Блокируем сигналы таблицы на время заполнения: начальные значения
+        # не должны порождать itemChanged/stateChanged и записи в БД
+        with QSignalBlocker(self.models_table):
+            self.models_table.setRowCount(len(models))
+        
+            for row, model in enumerate(models):
+                # Чекбокс активности (состояние задаем до подключения сигнала)
+                checkbox = QCheckBox()
+                is_active = self._dirty_active.get(model['id'], model['is_active'])
+                checkbox.setChecked(is_active == 1)
+                checkbox.stateChanged.connect(
+                    lambda state, m_id=model['id']: self.toggle_model_active(m_id, state)
+                )
+                self.models_table.setCellWidget(row, 0, checkbox)
             
-            # Название
-            name_item = QTableWidgetItem(model['name'])
-            name_item.setData(Qt.UserRole, model['id'])  # Сохраняем ID
-            self.models_table.setItem(row, 1, name_item)
+                # Название
+                name_item = QTableWidgetItem(model['name'])
+                name_item.setData(Qt.UserRole, model['id'])  # Сохраняем ID
+                self.models_table.setItem(row, 1, name_item)
             
-            # API URL
-            url_item = QTableWidgetItem(model['api_url'])
-            self.models_table.setItem(row, 2, url_item)
+                # API URL
+                url_item = QTableWidgetItem(model['api_url'])
+                self.models_table.setItem(row, 2, url_item)
             
-            # API Key Env
-            api_id_item = QTableWidgetItem(model['api_id'])
-            self.models_table.setItem(row, 3, api_id_item)
+                # API Key Env
+                api_id_item = QTableWidgetItem(model['api_id'])
+                self.models_table.setItem(row, 3, api_id_item)
             
-            # Кнопки действий
-            actions_widget = QWidget()
-            actions_layout = QHBoxLayout()
-            actions_layout.setContentsMargins(2, 2, 2, 2)
-            actions_widget.setLayout(actions_layout)
+                # Кнопки действий
+                actions_widget = QWidget()
+                actions_layout = QHBoxLayout()
+                actions_layout.setContentsMargins(2, 2, 2, 2)
+                actions_widget.setLayout(actions_layout)
             
-            edit_button = QPushButton("✏️")
-            edit_button.setMaximumWidth(30)
-            edit_button.clicked.connect(
-                lambda checked, r=row: self.edit_model(r)
-            )
+                edit_button = QPushButton("✏️")
+                edit_button.setMaximumWidth(30)
+                edit_button.clicked.connect(
+                    lambda checked, r=row: self.edit_model(r)
+                )
             
-            delete_button = QPushButton("🗑️")
-            delete_button.setMaximumWidth(30)
-            delete_button.clicked.connect(
-                lambda checked, m_id=model['id']: self.delete_model(m_id)
-            )
+                delete_button = QPushButton("🗑️")
+                delete_button.setMaximumWidth(30)
+                delete_button.clicked.connect(
+                    lambda checked, m_id=model['id']: self.delete_model(m_id)
+                )
             
-            actions_layout.addWidget(edit_button)
-            actions_layout.addWidget(delete_button)
+                actions_layout.addWidget(edit_button)
+                actions_layout.addWidget(delete_button)
             
-            # Устанавливаем виджет с кнопками
-            self.models_table.setCellWidget(row, 4, actions_widget)
+                # Устанавливаем виджет с кнопками
+                self.models_table.setCellWidget(row, 4, actions_widget)
     
     def toggle_model_active(self, model_id: int, state: int):
-        """Переключить активность модели."""
-        is_active = 1 if state == Qt.Checked else 0
-        self.db.update_model(model_id, is_active=is_active)
+        """Переключить активность модели (изменение сохраняется при нажатии OK)."""
+        self._dirty_active[model_id] = 1 if state == Qt.Checked else 0
+    
+    def accept(self):
+        """Сохранить накопленные изменения активности одним запросом и закрыть диалог."""
+        if self._dirty_active:
+            try:
+                self.db.bulk_update_active(self._dirty_active)
+            except Exception as e:
+                QMessageBox.critical(self, _TITLE_ERR, f"Ошибка при сохранении активности моделей: {str(e)}")
+                return
+            self._dirty_active.clear()
+        super().accept()
     
     def add_model(self):
         """Добавить новую модель."""
@@ -249,15 +292,15 @@ class ModelEditDialog(QDialog):
         
         # Базовая валидация
         if not name:
-            QMessageBox.warning(self, "Ошибка", "Введите название модели!")
+            QMessageBox.warning(self, _TITLE_ERR, _ERR_NAME)
             return
         
         if not api_url:
-            QMessageBox.warning(self, "Ошибка", "Введите API URL!")
+            QMessageBox.warning(self, _TITLE_ERR, _ERR_URL)
             return
         
         if not api_id:
-            QMessageBox.warning(self, "Ошибка", "Введите имя переменной окружения!")
+            QMessageBox.warning(self, _TITLE_ERR, _ERR_API_ID)
             return
         
         # Проверяем наличие API-ключа
@@ -266,27 +309,16 @@ class ModelEditDialog(QDialog):
             QMessageBox.warning(
                 self,
                 "Ошибка проверки",
-                f"API ключ не найден!\n\n"
-                f"Переменная окружения '{api_id}' не найдена в файле .env.\n\n"
-                f"Проверьте:\n"
-                f"1. Файл .env существует в корне проекта\n"
-                f"2. В файле .env есть строка: {api_id}=ваш_ключ\n"
-                f"3. Ключ не является заглушкой"
+                _ENV_MISSING_TMPL.format(api_id=api_id)
             )
             return
         
         # Проверяем, что ключ не заглушка
-        placeholders = [
-            'sk-your-', 'gsk_your-', 'sk-or-your-', 
-            'your-api-key', 'api-key-here'
-        ]
-        if any(ph in api_key.lower() for ph in placeholders):
+        if _PLACEHOLDER_RE.search(api_key):
             QMessageBox.warning(
                 self,
                 "Предупреждение",
-                f"Обнаружена заглушка вместо реального ключа!\n\n"
-                f"Значение переменной '{api_id}' похоже на заглушку.\n"
-                f"Замените её на реальный API-ключ в файле .env"
+                _PLACEHOLDER_FOUND_TMPL.format(api_id=api_id)
             )
             return
         
@@ -332,20 +364,20 @@ class ModelEditDialog(QDialog):
         api_id = self.api_id_input.text().strip()
         
         if not name:
-            QMessageBox.warning(self, "Ошибка", "Введите название модели!")
+            QMessageBox.warning(self, _TITLE_ERR, _ERR_NAME)
             return
         
         if not api_url:
-            QMessageBox.warning(self, "Ошибка", "Введите API URL!")
+            QMessageBox.warning(self, _TITLE_ERR, _ERR_URL)
             return
         
         if not api_id:
-            QMessageBox.warning(self, "Ошибка", "Введите имя переменной окружения!")
+            QMessageBox.warning(self, _TITLE_ERR, _ERR_API_ID)
             return
         
         # Простая валидация URL
         if not (api_url.startswith("http://") or api_url.startswith("https://")):
-            QMessageBox.warning(self, "Ошибка", "API URL должен начинаться с http:// или https://")
+            QMessageBox.warning(self, _TITLE_ERR, _ERR_URL_SCHEME)
             return
         
         # Автоматическая проверка модели перед сохранением
@@ -417,11 +449,7 @@ class ModelEditDialog(QDialog):
                     return
         else:
             # Проверяем, что ключ не заглушка
-            placeholders = [
-                'sk-your-', 'gsk_your-', 'sk-or-your-', 
-                'your-api-key', 'api-key-here'
-            ]
-            if any(ph in api_key.lower() for ph in placeholders):
+            if _PLACEHOLDER_RE.search(api_key):
                 # Обнаружена заглушка - предлагаем ввести реальный ключ
                 reply = QMessageBox.question(
                     self,
@@ -440,7 +468,7 @@ class ModelEditDialog(QDialog):
                         load_env_file()
                         api_key = os.getenv(api_id)
                         # Проверяем, что ключ больше не заглушка
-                        if api_key and any(ph in api_key.lower() for ph in placeholders):
+                        if api_key and _PLACEHOLDER_RE.search(api_key):
                             QMessageBox.warning(
                                 self,
                                 "Предупреждение",
@@ -534,8 +562,8 @@ class APIKeyInputDialog(QDialog):
         
         # Информация о расположении файла
         from config import get_app_data_dir
-        env_path = get_app_data_dir() / ".env"
-        path_label = QLabel(f"Файл будет сохранен в:\n{env_path}")
+        self._env_path = get_app_data_dir() / ".env"
+        path_label = QLabel(f"Файл будет сохранен в:\n{self._env_path}")
         path_label.setWordWrap(True)
         path_label.setStyleSheet("color: gray; font-size: 9pt;")
         layout.addWidget(path_label)
@@ -558,35 +586,32 @@ class APIKeyInputDialog(QDialog):
         api_key = self.key_input.text().strip()
         
         if not api_key:
-            QMessageBox.warning(self, "Ошибка", "Введите API ключ!")
+            QMessageBox.warning(self, _TITLE_ERR, "Введите API ключ!")
             return
         
         try:
-            from config import get_app_data_dir
-            env_path = get_app_data_dir() / ".env"
+            env_path = self._env_path
             
-            # Читаем существующий .env файл, если он есть
-            env_lines = []
+            # Читаем существующий .env файл целиком, если он есть
+            content = ""
             if env_path.exists():
                 with open(env_path, 'r', encoding='utf-8') as f:
-                    env_lines = f.readlines()
+                    content = f.read()
             
-            # Ищем строку с нужной переменной
-            found = False
-            for i, line in enumerate(env_lines):
-                if line.strip().startswith(f"{self.api_key_env}="):
-                    # Обновляем существующую строку
-                    env_lines[i] = f"{self.api_key_env}={api_key}\n"
-                    found = True
-                    break
+            # Ищем строку с нужной переменной одним проходом регулярного выражения
+            new_line = f"{self.api_key_env}={api_key}"
+            line_re = re.compile(rf"^[ \t]*{re.escape(self.api_key_env)}=.*$", re.MULTILINE)
+            content, found = line_re.subn(lambda m: new_line, content, count=1)
             
             # Если переменная не найдена, добавляем новую строку
             if not found:
-                env_lines.append(f"{self.api_key_env}={api_key}\n")
+                if content and not content.endswith("\n"):
+                    content += "\n"
+                content += new_line + "\n"
             
             # Записываем обновленный .env файл
             with open(env_path, 'w', encoding='utf-8') as f:
-                f.writelines(env_lines)
+                f.write(content)
             
             # Перезагружаем переменные окружения через config
             from config import load_env_file
@@ -3,9 +3,13 @@
 Управляет загрузкой моделей из БД и отправкой запросов.
 """
 import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Dict, Optional
+from config import get_env, load_env_file
 from db import Database
-from network import APIClient, OpenAIClient, DeepSeekClient, GroqClient, OpenRouterClient, create_api_client
+from network import SendsRequests, OpenAICompatClient, PROVIDERS, classify_provider, create_api_client
 
 # Настройка логирования
 logging.basicConfig(
@@ -14,6 +18,14 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+__all__ = ['ModelManager']
+
+# Максимальное число одновременных запросов к API
+MAX_PARALLEL_REQUESTS = 16
+
+# Время жизни кэша списка активных моделей (секунды)
+ACTIVE_MODELS_TTL = 5.0
+
 
 class ModelManager:
     """Класс для управления моделями нейросетей."""
@@ -26,45 +38,38 @@ class ModelManager:
             db: Экземпляр класса Database
         """
         self.db = db
-        self.api_clients: Dict[int, APIClient] = {}
-        self._load_clients()
+        self.api_clients: Dict[int, SendsRequests] = {}
+        # Общий пул потоков для запросов, создается при первой отправке
+        self._executor: Optional[ThreadPoolExecutor] = None
+        # Кэш списка активных моделей и время его заполнения
+        self._models_cache: Optional[List[Dict]] = None
+        self._models_cache_ts = 0.0
+        # Фоновое пересоздание клиентов (см. refresh_clients)
+        self._rebuild_lock = threading.Lock()
+        self._rebuild_requested = threading.Event()
+        self._rebuild_thread: Optional[threading.Thread] = None
     
-    def _load_clients(self):
-        """Загрузить и создать API-клиенты для всех активных моделей."""
-        active_models = self.db.get_active_models()
-        self.api_clients.clear()
-        
-        if not active_models:
-            logger.warning("Нет активных моделей для загрузки")
-            return
-        
-        loaded_count = 0
-        failed_count = 0
-        
-        for model in active_models:
-            try:
-                client = self._create_client(model)
-                if client:
-                    self.api_clients[model['id']] = client
-                    logger.info(f"Загружен клиент для модели: {model['name']}")
-                    loaded_count += 1
-                else:
-                    logger.error(f"Не удалось создать клиент для модели {model['name']}")
-                    failed_count += 1
-            except ValueError as e:
-                # Ошибка с API ключом - логируем подробно
-                logger.error(f"Ошибка создания клиента для модели '{model['name']}': {str(e)}")
-                failed_count += 1
-            except Exception as e:
-                logger.error(f"Неизвестная ошибка создания клиента для модели '{model['name']}': {str(e)}")
-                failed_count += 1
+    def _get_client(self, model: Dict) -> Optional[SendsRequests]:
+        """
+        Получить API-клиент модели, создав его при первом обращении.
         
-        if failed_count > 0:
-            logger.warning(f"Загружено клиентов: {loaded_count}, ошибок: {failed_count}")
-        else:
-            logger.info(f"Успешно загружено {loaded_count} клиентов")
+        Args:
+            model: Словарь с данными модели из БД
+            
+        Returns:
+            Экземпляр API-клиента или None при ошибке
+            
+        Raises:
+            ValueError: Если не найден API-ключ модели
+        """
+        client = self.api_clients.get(model['id'])
+        if client is None:
+            client = self._create_client(model)
+            if client is not None:
+                self.api_clients[model['id']] = client
+        return client
     
-    def _create_client(self, model: Dict) -> Optional[APIClient]:
+    def _create_client(self, model: Dict) -> Optional[SendsRequests]:
         """
         Создать API-клиент для модели.
         
@@ -76,13 +81,10 @@ class ModelManager:
         """
         try:
             model_name = model['name']
-            model_name_lower = model_name.lower()
-            api_url = model['api_url'].lower()
             api_key_env = model['api_id']
             
             # Проверяем наличие API ключа
-            import os
-            api_key = os.getenv(api_key_env)
+            api_key = get_env(api_key_env)
             if not api_key:
                 error_msg = (
                     f"API ключ не найден для модели '{model_name}'. "
@@ -91,18 +93,14 @@ class ModelManager:
                 logger.error(error_msg)
                 raise ValueError(error_msg)
             
-            # Определяем тип клиента
-            if "openrouter" in api_url or "openrouter" in model_name_lower:
-                return OpenRouterClient(api_key_env=api_key_env)
-            elif "openai" in api_url or "openai" in model_name_lower:
-                return OpenAIClient(api_key_env=api_key_env)
-            elif "deepseek" in api_url or "deepseek" in model_name_lower:
-                return DeepSeekClient(api_key_env=api_key_env)
-            elif "groq" in api_url or "groq" in model_name_lower:
-                return GroqClient(api_key_env=api_key_env)
-            else:
-                # Пытаемся использовать фабричную функцию
-                return create_api_client(model['name'], model['api_url'], api_key_env)
+            # Тип провайдера вычисляется один раз при чтении модели из БД
+            provider = model.get('_provider')
+            if provider is None:
+                provider = classify_provider(model['api_url'], model_name)
+            if provider is not None:
+                return OpenAICompatClient(PROVIDERS[provider], api_key_env=api_key_env)
+            # Фабричная функция сообщит о неизвестном типе модели
+            return create_api_client(model_name, model['api_url'], api_key_env)
         except ValueError as e:
             # Ошибка с API ключом - пробрасываем дальше с подробным сообщением
             logger.error(f"Ошибка создания клиента для модели '{model.get('name', 'Unknown')}': {str(e)}")
@@ -119,11 +117,73 @@ class ModelManager:
         Returns:
             Список словарей с данными активных моделей
         """
-        return self.db.get_active_models()
+        return self._active_models()
+    
+    def _active_models(self) -> List[Dict]:
+        """
+        Получить список активных моделей с кэшированием на ACTIVE_MODELS_TTL секунд.
+        Кэш сбрасывается в refresh_clients.
+        """
+        now = time.monotonic()
+        if self._models_cache is None or now - self._models_cache_ts >= ACTIVE_MODELS_TTL:
+            models = self.db.get_active_models()
+            for model in models:
+                model['_provider'] = classify_provider(model['api_url'], model['name'])
+            self._models_cache = models
+            self._models_cache_ts = now
+        return self._models_cache
+    
+    def reload_env(self):
+        """Перечитать .env и пересоздать клиенты с новыми API-ключами."""
+        load_env_file()
+        self.refresh_clients()
     
     def refresh_clients(self):
-        """Обновить список клиентов (после изменения моделей в БД)."""
-        self._load_clients()
+        """
+        Обновить список клиентов (после изменения моделей в БД).
+        Новые клиенты создаются в фоновом потоке; до их готовности запросы
+        обслуживают текущие клиенты (stale-while-revalidate).
+        """
+        self._models_cache = None
+        with self._rebuild_lock:
+            self._rebuild_requested.set()
+            if self._rebuild_thread is None:
+                self._rebuild_thread = threading.Thread(
+                    target=self._rebuild_clients,
+                    name="clients-rebuild",
+                    daemon=True
+                )
+                self._rebuild_thread.start()
+    
+    def _rebuild_clients(self):
+        """Пересоздать клиенты активных моделей и атомарно заменить ими текущие."""
+        while True:
+            with self._rebuild_lock:
+                # Повторные вызовы refresh_clients во время пересоздания
+                # объединяются в один дополнительный проход
+                if not self._rebuild_requested.is_set():
+                    self._rebuild_thread = None
+                    return
+                self._rebuild_requested.clear()
+            
+            new_clients: Dict[int, SendsRequests] = {}
+            try:
+                # Клиенты создаются по мере чтения строк из БД
+                for model in self.db.iter_active_models():
+                    try:
+                        client = self._create_client(model)
+                    except Exception:
+                        # Ошибка уже записана в лог; клиент будет создан при обращении
+                        continue
+                    if client is not None:
+                        new_clients[model['id']] = client
+            except Exception as e:
+                # Текущие клиенты продолжают обслуживать запросы
+                logger.error(f"Ошибка фонового обновления клиентов: {str(e)}")
+                continue
+            
+            self.api_clients = new_clients
+            logger.info(f"Клиенты обновлены: {len(new_clients)}")
     
     def send_to_all_models(self, prompt: str) -> List[Dict]:
         """
@@ -140,8 +200,7 @@ class ModelManager:
                 - error: Текст ошибки (если есть)
                 - success: Флаг успешности запроса
         """
-        results = []
-        active_models = self.db.get_active_models()
+        active_models = self._active_models()
         
         if not active_models:
             error_msg = "Не найдено активных моделей в базе данных. Добавьте модели через меню 'Настройки' → 'Управление моделями'."
@@ -150,67 +209,86 @@ class ModelManager:
         
         logger.info(f"Отправка промта в {len(active_models)} активных моделей")
         
-        for model in active_models:
-            model_id = model['id']
-            model_name = model['name']
-            
-            result = {
-                'model_id': model_id,
-                'model_name': model_name,
-                'response': '',
-                'error': None,
-                'success': False
-            }
-            
-            # Получаем или создаем клиент
-            if model_id not in self.api_clients:
-                try:
-                    client = self._create_client(model)
-                    if client:
-                        self.api_clients[model_id] = client
-                    else:
-                        result['error'] = f"Не удалось создать API-клиент для модели '{model_name}'. Проверьте настройки модели."
-                        logger.error(result['error'])
-                        results.append(result)
-                        continue
-                except ValueError as e:
-                    # Ошибка с API ключом - сохраняем подробное сообщение
-                    result['error'] = str(e)
-                    logger.error(f"Ошибка для модели '{model_name}': {result['error']}")
-                    results.append(result)
-                    continue
-                except Exception as e:
-                    result['error'] = f"Ошибка создания клиента для модели '{model_name}': {str(e)}"
-                    logger.error(result['error'])
-                    results.append(result)
-                    continue
-            
-            client = self.api_clients[model_id]
-            
-            # Отправляем запрос
-            try:
-                logger.info(f"Отправка запроса к модели: {model_name}")
-                response = client.send_request(prompt)
-                result['response'] = response
-                result['success'] = True
-                logger.info(f"Успешный ответ от модели: {model_name}")
-            except Exception as e:
-                error_msg = str(e)
-                result['error'] = error_msg
-                result['success'] = False
-                logger.error(f"Ошибка при запросе к модели {model_name}: {error_msg}")
+        # Запросы к API ограничены сетью, поэтому отправляем их параллельно:
+        # общее время равно времени самой медленной модели, а не сумме.
+        # Порядок результатов совпадает с порядком активных моделей.
+        executor = self._get_executor()
+        futures = [executor.submit(self._send_one, model, prompt) for model in active_models]
+        return [future.result() for future in futures]
+    
+    def _get_executor(self) -> ThreadPoolExecutor:
+        """
+        Получить общий пул потоков для запросов к API.
+        Пул переиспользуется между отправками, чтобы не создавать потоки заново.
+        """
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=MAX_PARALLEL_REQUESTS,
+                thread_name_prefix="api-request"
+            )
+        return self._executor
+    
+    def _send_one(self, model: Dict, prompt: str, system_prompt: Optional[str] = None) -> Dict:
+        """
+        Отправить промт в одну модель, создав клиент при необходимости.
+        
+        Args:
+            model: Словарь с данными модели из БД
+            prompt: Текст промта
+            system_prompt: Системная инструкция (необязательно)
             
-            results.append(result)
+        Returns:
+            Словарь с результатом (см. send_to_all_models)
+        """
+        model_id = model['id']
+        model_name = model['name']
         
-        return results
+        result = {
+            'model_id': model_id,
+            'model_name': model_name,
+            'response': '',
+            'error': None,
+            'success': False
+        }
+        
+        # Получаем или создаем клиент
+        try:
+            client = self._get_client(model)
+        except ValueError as e:
+            # Ошибка с API ключом - сохраняем подробное сообщение
+            result['error'] = str(e)
+            logger.error(f"Ошибка для модели '{model_name}': {result['error']}")
+            return result
+        except Exception as e:
+            result['error'] = f"Ошибка создания клиента для модели '{model_name}': {str(e)}"
+            logger.error(result['error'])
+            return result
+        
+        if client is None:
+            result['error'] = f"Не удалось создать API-клиент для модели '{model_name}'. Проверьте настройки модели."
+            logger.error(result['error'])
+            return result
+        
+        # Отправляем запрос
+        try:
+            logger.info(f"Отправка запроса к модели: {model_name}")
+            result['response'] = client.send_request(prompt, system_prompt)
+            result['success'] = True
+            logger.info(f"Успешный ответ от модели: {model_name}")
+        except Exception as e:
+            result['error'] = str(e)
+            logger.error(f"Ошибка при запросе к модели {model_name}: {result['error']}")
+        
+        return result
     
-    def send_to_model(self, model_id: int, prompt: str) -> Dict:
+    def send_to_model(self, model_id: int, prompt: str, system_prompt: Optional[str] = None) -> Dict:
         """
         Отправить промт в конкретную модель.
         
         Args:
             model_id: ID модели
             prompt: Текст промта
+            system_prompt: Системная инструкция, передаваемая отдельным сообщением
             
         Returns:
             Словарь с результатом:
@@ -232,66 +310,4 @@ class ModelManager:
                 'success': False
             }
         
-        # Получаем или создаем клиент
-        if model_id not in self.api_clients:
-            try:
-                client = self._create_client(model)
-                if client:
-                    self.api_clients[model_id] = client
-                else:
-                    error_msg = f"Не удалось создать API-клиент для модели '{model['name']}'. Проверьте настройки модели."
-                    logger.error(error_msg)
-                    return {
-                        'model_id': model_id,
-                        'model_name': model['name'],
-                        'response': '',
-                        'error': error_msg,
-                        'success': False
-                    }
-            except ValueError as e:
-                # Ошибка с API ключом
-                error_msg = str(e)
-                logger.error(f"Ошибка для модели '{model['name']}': {error_msg}")
-                return {
-                    'model_id': model_id,
-                    'model_name': model['name'],
-                    'response': '',
-                    'error': error_msg,
-                    'success': False
-                }
-            except Exception as e:
-                error_msg = f"Ошибка создания клиента для модели '{model['name']}': {str(e)}"
-                logger.error(error_msg)
-                return {
-                    'model_id': model_id,
-                    'model_name': model['name'],
-                    'response': '',
-                    'error': error_msg,
-                    'success': False
-                }
-        
-        client = self.api_clients[model_id]
-        
-        # Отправляем запрос
-        try:
-            logger.info(f"Отправка запроса к модели: {model['name']}")
-            response = client.send_request(prompt)
-            logger.info(f"Успешный ответ от модели: {model['name']}")
-            return {
-                'model_id': model_id,
-                'model_name': model['name'],
-                'response': response,
-                'error': None,
-                'success': True
-            }
-        except Exception as e:
-            error_msg = str(e)
-            logger.error(f"Ошибка при запросе к модели {model['name']}: {error_msg}")
-            return {
-                'model_id': model_id,
-                'model_name': model['name'],
-                'response': '',
-                'error': error_msg,
-                'success': False
-            }
-
+        return self._send_one(model, prompt, system_prompt)
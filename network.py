@@ -2,16 +2,91 @@
 Модуль для работы с API нейросетей.
 Содержит классы для отправки запросов к различным API.
 """
-import os
+import json
+import re
+import threading
+from dataclasses import dataclass
+from functools import lru_cache
 import requests
-from typing import Optional
-from abc import ABC, abstractmethod
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from typing import Dict, Optional, Protocol, Tuple
+from urllib.parse import urlsplit
 # Импортируем config для автоматической загрузки .env из правильной папки
-import config  # noqa: F401
+from config import get_env
 
+try:
+    # Быстрый JSON-парсер (необязательная зависимость)
+    import orjson
+except ImportError:
+    orjson = None
 
-class APIClient(ABC):
-    """Базовый класс для работы с API нейросетей."""
+
+# Повтор запросов при временных ошибках провайдера (перегрузка, лимиты, сбои шлюза).
+# Ошибки чтения не повторяются: POST мог быть уже обработан, а таймаут умножился бы.
+_RETRY = Retry(
+    total=3,
+    read=0,
+    backoff_factor=0.5,
+    status_forcelist=(429, 502, 503, 504),
+    allowed_methods=frozenset({"POST"}),
+    respect_retry_after_header=True,
+    raise_on_status=False
+)
+
+# Общие HTTP-сессии по хостам: клиенты разных моделей одного провайдера
+# используют один пул соединений
+_SESSIONS: Dict[str, requests.Session] = {}
+_SESSIONS_LOCK = threading.Lock()
+
+
+def _shared_session(api_url: str) -> requests.Session:
+    """
+    Получить общую HTTP-сессию для хоста API.
+    
+    Args:
+        api_url: URL API-эндпоинта
+        
+    Returns:
+        Сессия с пулом keep-alive соединений к этому хосту
+    """
+    host = urlsplit(api_url).netloc
+    with _SESSIONS_LOCK:
+        session = _SESSIONS.get(host)
+        if session is None:
+            session = requests.Session()
+            session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=16, max_retries=_RETRY))
+            _SESSIONS[host] = session
+        return session
+
+
+class SendsRequests(Protocol):
+    """Интерфейс клиента, умеющего отправлять промт в модель."""
+    
+    def send_request(self, prompt: str, system_prompt: Optional[str] = None) -> str:
+        """
+        Отправить запрос к API.
+        
+        Args:
+            prompt: Текст промта
+            system_prompt: Системная инструкция (отдельное сообщение с ролью system)
+            
+        Returns:
+            Текст ответа от API
+            
+        Raises:
+            Exception: При ошибке запроса
+        """
+        ...
+
+
+class APIClient:
+    """
+    Базовый класс для работы с API нейросетей: общий код клиентов (сессия,
+    заголовки, разбор ответа). Интерфейс клиента описан протоколом SendsRequests.
+    """
+    
+    __slots__ = ('api_url', 'api_key_env', 'timeout', 'api_key', '_headers', '_session')
     
     def __init__(self, api_url: str, api_key_env: str, timeout: int = 30):
         """
@@ -25,7 +100,7 @@ class APIClient(ABC):
         self.api_url = api_url
         self.api_key_env = api_key_env
         self.timeout = timeout
-        self.api_key = os.getenv(api_key_env)
+        self.api_key = get_env(api_key_env)
         
         if not self.api_key:
             error_msg = (
@@ -37,22 +112,16 @@ class APIClient(ABC):
                 f"4. Нет лишних пробелов или кавычек вокруг значения"
             )
             raise ValueError(error_msg)
-    
-    @abstractmethod
-    def send_request(self, prompt: str) -> str:
-        """
-        Отправить запрос к API.
         
-        Args:
-            prompt: Текст промта
-            
-        Returns:
-            Текст ответа от API
-            
-        Raises:
-            Exception: При ошибке запроса
-        """
-        pass
+        # Заголовки не меняются за время жизни клиента, собираем их один раз
+        self._headers = {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json"
+        }
+        
+        # Постоянная сессия: соединения (TCP + TLS) переиспользуются между запросами
+        # и между клиентами одного хоста
+        self._session = _shared_session(api_url)
     
     def _make_request(self, method: str = "POST", **kwargs) -> requests.Response:
         """
@@ -69,7 +138,7 @@ class APIClient(ABC):
             requests.RequestException: При ошибке запроса
         """
         try:
-            response = requests.request(
+            response = self._session.request(
                 method,
                 self.api_url,
                 timeout=self.timeout,
@@ -81,219 +150,174 @@ class APIClient(ABC):
             raise Exception(f"Таймаут запроса к {self.api_url}")
         except requests.RequestException as e:
             raise Exception(f"Ошибка запроса к API: {str(e)}")
-
-
-class OpenAIClient(APIClient):
-    """Клиент для работы с OpenAI API."""
     
-    def __init__(self, api_key_env: str = "OPENAI_API_KEY", 
-                 model: str = "gpt-3.5-turbo", timeout: int = 30):
+    @staticmethod
+    def _parse_json(response: requests.Response) -> dict:
         """
-        Инициализация OpenAI клиента.
+        Разобрать JSON-тело ответа (через orjson, если он установлен).
         
         Args:
-            api_key_env: Имя переменной окружения с API-ключом
-            model: Название модели OpenAI
-            timeout: Таймаут запроса
+            response: Response объект
+            
+        Returns:
+            Словарь с данными ответа
         """
-        super().__init__(
-            api_url="https://api.openai.com/v1/chat/completions",
-            api_key_env=api_key_env,
-            timeout=timeout
-        )
-        self.model = model
+        if orjson is not None:
+            return orjson.loads(response.content)
+        return response.json()
     
-    def send_request(self, prompt: str) -> str:
+    @staticmethod
+    def _extract_choice(result: dict, provider: str) -> str:
         """
-        Отправить запрос к OpenAI API.
+        Извлечь текст первого варианта ответа в формате chat/completions.
         
         Args:
-            prompt: Текст промта
+            result: Разобранный JSON-ответ API
+            provider: Название провайдера для сообщения об ошибке
             
         Returns:
             Текст ответа от модели
         """
-        headers = {
-            "Authorization": f"Bearer {self.api_key}",
-            "Content-Type": "application/json"
-        }
-        
-        data = {
-            "model": self.model,
-            "messages": [
-                {"role": "user", "content": prompt}
-            ],
-            "temperature": 0.7
-        }
-        
-        response = self._make_request("POST", headers=headers, json=data)
-        result = response.json()
-        
-        if "choices" in result and len(result["choices"]) > 0:
-            return result["choices"][0]["message"]["content"]
-        else:
-            raise Exception("Неожиданный формат ответа от OpenAI API")
+        choices = result.get("choices")
+        if choices:
+            return choices[0]["message"]["content"]
+        raise Exception(f"Неожиданный формат ответа от {provider} API")
 
 
-class DeepSeekClient(APIClient):
-    """Клиент для работы с DeepSeek API."""
-    
-    def __init__(self, api_key_env: str = "DEEPSEEK_API_KEY",
-                 model: str = "deepseek-chat", timeout: int = 30):
-        """
-        Инициализация DeepSeek клиента.
-        
-        Args:
-            api_key_env: Имя переменной окружения с API-ключом
-            model: Название модели DeepSeek
-            timeout: Таймаут запроса
-        """
-        super().__init__(
-            api_url="https://api.deepseek.com/v1/chat/completions",
-            api_key_env=api_key_env,
-            timeout=timeout
-        )
-        self.model = model
+def _dumps(value) -> bytes:
+    """Сериализовать значение в компактный JSON (UTF-8)."""
+    if orjson is not None:
+        return orjson.dumps(value)
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+@dataclass(frozen=True)
+class ProviderConfig:
+    """Параметры OpenAI-совместимого провайдера."""
     
-    def send_request(self, prompt: str) -> str:
-        """
-        Отправить запрос к DeepSeek API.
-        
-        Args:
-            prompt: Текст промта
-            
-        Returns:
-            Текст ответа от модели
-        """
-        headers = {
-            "Authorization": f"Bearer {self.api_key}",
-            "Content-Type": "application/json"
-        }
-        
-        data = {
-            "model": self.model,
-            "messages": [
-                {"role": "user", "content": prompt}
-            ],
-            "temperature": 0.7
-        }
-        
-        response = self._make_request("POST", headers=headers, json=data)
-        result = response.json()
-        
-        if "choices" in result and len(result["choices"]) > 0:
-            return result["choices"][0]["message"]["content"]
-        else:
-            raise Exception("Неожиданный формат ответа от DeepSeek API")
+    name: str  # Название провайдера для сообщений об ошибках
+    api_url: str  # URL chat/completions эндпоинта
+    api_key_env: str  # Имя переменной окружения с API-ключом по умолчанию
+    model: str  # Модель по умолчанию
+    extra_headers: Tuple[Tuple[str, str], ...] = ()  # Дополнительные заголовки запроса
+
 
+# Поддерживаемые провайдеры. Порядок важен для определения типа:
+# "openrouter" проверяется раньше "openai"
+PROVIDERS = {
+    "openrouter": ProviderConfig(
+        name="OpenRouter",
+        api_url="https://openrouter.ai/api/v1/chat/completions",
+        api_key_env="OPENROUTER_API_KEY",
+        model="openai/gpt-3.5-turbo",  # Формат: provider/model-name
+        extra_headers=(
+            ("HTTP-Referer", "https://github.com/rbait31/ChatList"),  # Опционально, для статистики
+            ("X-Title", "ChatList"),  # Опционально, для статистики
+        ),
+    ),
+    "openai": ProviderConfig(
+        name="OpenAI",
+        api_url="https://api.openai.com/v1/chat/completions",
+        api_key_env="OPENAI_API_KEY",
+        model="gpt-3.5-turbo",
+    ),
+    "deepseek": ProviderConfig(
+        name="DeepSeek",
+        api_url="https://api.deepseek.com/v1/chat/completions",
+        api_key_env="DEEPSEEK_API_KEY",
+        model="deepseek-chat",
+    ),
+    "groq": ProviderConfig(
+        name="Groq",
+        api_url="https://api.groq.com/openai/v1/chat/completions",
+        api_key_env="GROQ_API_KEY",
+        model="mixtral-8x7b-32768",
+    ),
+}
 
-class GroqClient(APIClient):
-    """Клиент для работы с Groq API."""
+
+class OpenAICompatClient(APIClient):
+    """Клиент для API, совместимых с OpenAI chat/completions (OpenAI, DeepSeek, Groq, OpenRouter)."""
+    
+    __slots__ = ('provider', 'model', '_payload_prefix')
     
-    def __init__(self, api_key_env: str = "GROQ_API_KEY",
-                 model: str = "mixtral-8x7b-32768", timeout: int = 30):
+    def __init__(self, provider: ProviderConfig, api_key_env: Optional[str] = None,
+                 model: Optional[str] = None, timeout: int = 30):
         """
-        Инициализация Groq клиента.
+        Инициализация клиента.
         
         Args:
-            api_key_env: Имя переменной окружения с API-ключом
-            model: Название модели Groq
+            provider: Параметры провайдера
+            api_key_env: Имя переменной окружения с API-ключом (по умолчанию из provider)
+            model: Название модели (по умолчанию из provider)
             timeout: Таймаут запроса
         """
         super().__init__(
-            api_url="https://api.groq.com/openai/v1/chat/completions",
-            api_key_env=api_key_env,
+            api_url=provider.api_url,
+            api_key_env=api_key_env or provider.api_key_env,
             timeout=timeout
         )
-        self.model = model
+        self.provider = provider
+        self.model = model or provider.model
+        self._headers.update(provider.extra_headers)
+        # Неизменная часть тела запроса сериализуется один раз; в send_request
+        # дописываются только сообщения
+        self._payload_prefix = _dumps({"model": self.model, "temperature": 0.7})[:-1]
     
-    def send_request(self, prompt: str) -> str:
+    def send_request(self, prompt: str, system_prompt: Optional[str] = None) -> str:
         """
-        Отправить запрос к Groq API.
+        Отправить запрос к API провайдера.
         
         Args:
             prompt: Текст промта
+            system_prompt: Системная инструкция. Передается первым сообщением, чтобы
+                неизменный префикс запроса мог кэшироваться на стороне провайдера
             
         Returns:
             Текст ответа от модели
         """
-        headers = {
-            "Authorization": f"Bearer {self.api_key}",
-            "Content-Type": "application/json"
-        }
-        
-        data = {
-            "model": self.model,
-            "messages": [
-                {"role": "user", "content": prompt}
-            ],
-            "temperature": 0.7
-        }
-        
-        response = self._make_request("POST", headers=headers, json=data)
-        result = response.json()
+        messages = b',"messages":['
+        if system_prompt:
+            messages += b'{"role":"system","content":' + _dumps(system_prompt) + b'},'
+        body = (
+            self._payload_prefix
+            + messages
+            + b'{"role":"user","content":'
+            + _dumps(prompt)
+            + b'}]}'
+        )
         
-        if "choices" in result and len(result["choices"]) > 0:
-            return result["choices"][0]["message"]["content"]
-        else:
-            raise Exception("Неожиданный формат ответа от Groq API")
+        response = self._make_request("POST", headers=self._headers, data=body)
+        return self._extract_choice(self._parse_json(response), self.provider.name)
 
 
-class OpenRouterClient(APIClient):
-    """Клиент для работы с OpenRouter API."""
-    
-    def __init__(self, api_key_env: str = "OPENROUTER_API_KEY",
-                 model: str = "openai/gpt-3.5-turbo", timeout: int = 30):
-        """
-        Инициализация OpenRouter клиента.
-        
-        Args:
-            api_key_env: Имя переменной окружения с API-ключом
-            model: Название модели (формат: provider/model-name)
-            timeout: Таймаут запроса
-        """
-        super().__init__(
-            api_url="https://openrouter.ai/api/v1/chat/completions",
-            api_key_env=api_key_env,
-            timeout=timeout
-        )
-        self.model = model
+# Регулярное выражение для поиска названий провайдеров (без учета регистра)
+_PROVIDER_RE = re.compile("|".join(map(re.escape, PROVIDERS)), re.IGNORECASE)
+
+
+@lru_cache(maxsize=32)
+def classify_provider(api_url: str, model_name: str) -> Optional[str]:
+    """
+    Определить тип провайдера по URL или названию модели.
+    Результат кэшируется, так как набор моделей в БД невелик.
     
-    def send_request(self, prompt: str) -> str:
-        """
-        Отправить запрос к OpenRouter API.
-        
-        Args:
-            prompt: Текст промта
-            
-        Returns:
-            Текст ответа от модели
-        """
-        headers = {
-            "Authorization": f"Bearer {self.api_key}",
-            "Content-Type": "application/json",
-            "HTTP-Referer": "https://github.com/rbait31/ChatList",  # Опционально, для статистики
-            "X-Title": "ChatList"  # Опционально, для статистики
-        }
-        
-        data = {
-            "model": self.model,
-            "messages": [
-                {"role": "user", "content": prompt}
-            ],
-            "temperature": 0.7
-        }
-        
-        response = self._make_request("POST", headers=headers, json=data)
-        result = response.json()
+    Args:
+        api_url: URL API-эндпоинта
+        model_name: Название модели
         
-        if "choices" in result and len(result["choices"]) > 0:
-            return result["choices"][0]["message"]["content"]
-        else:
-            raise Exception("Неожиданный формат ответа от OpenRouter API")
+    Returns:
+        Ключ из PROVIDERS или None, если тип не распознан
+    """
+    # Один проход регулярного выражения по URL и названию; при нескольких
+    # совпадениях побеждает провайдер, стоящий раньше в PROVIDERS
+    found = {match.lower() for match in _PROVIDER_RE.findall(f"{api_url}\n{model_name}")}
+    for provider in PROVIDERS:
+        if provider in found:
+            return provider
+    return None
 
 
-def create_api_client(model_name: str, api_url: str, api_key_env: str) -> APIClient:
+def create_api_client(model_name: str, api_url: str, api_key_env: str) -> SendsRequests:
     """
     Фабричная функция для создания API-клиента по типу модели.
     
@@ -306,18 +330,7 @@ def create_api_client(model_name: str, api_url: str, api_key_env: str) -> APICli
         Экземпляр соответствующего API-клиента
     """
     # Определяем тип клиента по URL или названию модели
-    model_lower = model_name.lower()
-    
-    if "openrouter" in api_url.lower() or "openrouter" in model_lower:
-        return OpenRouterClient(api_key_env=api_key_env)
-    elif "openai" in api_url.lower() or "openai" in model_lower:
-        return OpenAIClient(api_key_env=api_key_env)
-    elif "deepseek" in api_url.lower() or "deepseek" in model_lower:
-        return DeepSeekClient(api_key_env=api_key_env)
-    elif "groq" in api_url.lower() or "groq" in model_lower:
-        return GroqClient(api_key_env=api_key_env)
-    else:
-        # Для неизвестных типов создаем базовый клиент
-        # В этом случае нужно будет переопределить send_request
+    provider = classify_provider(api_url, model_name)
+    if provider is None:
         raise ValueError(f"Неизвестный тип модели: {model_name}. Используйте один из: OpenRouter, OpenAI, DeepSeek, Groq")
-
+    return OpenAICompatClient(PROVIDERS[provider], api_key_env=api_key_env)
@@ -4,11 +4,76 @@
 """
 import logging
 import re
-from typing import Dict, List, Optional
+import threading
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Dict, List, Optional
 from models import ModelManager
 
 logger = logging.getLogger(__name__)
 
+# Максимальное число ответов моделей в кэше PromptImprover
+RESPONSE_CACHE_SIZE = 64
+
+# Период проверки отмены при ожидании ответов (секунды)
+CANCEL_POLL_INTERVAL = 0.1
+
+# Регулярные выражения для разбора ответов моделей
+_PREFIX_IMPROVED = re.compile(r'^(Улучшенный промпт|Вот улучшенный вариант|Улучшенная версия):\s*', re.IGNORECASE)
+_PREFIX_ADAPTED = re.compile(r'^(Адаптированный промпт|Вот адаптированный вариант):\s*', re.IGNORECASE)
+
+# Маркеры секций пакетного ответа (SYSTEM_PROMPTS['batch']) в порядке следования
+_BATCH_SECTIONS = (
+    ('improved', '<<<IMPROVED>>>'),
+    ('alternatives', '<<<ALTERNATIVES>>>'),
+    ('code_version', '<<<CODE>>>'),
+    ('analysis_version', '<<<ANALYSIS>>>'),
+    ('creative_version', '<<<CREATIVE>>>'),
+)
+_BATCH_END = '<<<END>>>'
+
+# Заголовок перед исходным промтом в пользовательском сообщении
+_SOURCE_PROMPT_PREFIX = "Исходный промпт:\n"
+
+
+def _strip_number_prefix(line: str) -> Optional[str]:
+    """
+    Отделить номер пункта списка ("1. текст", "12) текст") одним проходом по строке.
+    
+    Args:
+        line: Строка без начальных пробелов
+        
+    Returns:
+        Текст пункта без номера или None, если строка не начинается с номера
+    """
+    i = 0
+    n = len(line)
+    while i < n and '0' <= line[i] <= '9':
+        i += 1
+    # Нужны цифры, затем "." или ")", затем пробел или конец строки
+    if i == 0 or i == n or line[i] not in '.)':
+        return None
+    i += 1
+    if i < n and not line[i].isspace():
+        return None
+    return line[i:].strip()
+
+
+class ImproveResult:
+    """Результат улучшения промта."""
+    
+    __slots__ = ('improved', 'alternatives', 'code_version', 'analysis_version',
+                 'creative_version', 'success', 'error')
+    
+    def __init__(self):
+        self.improved = ''  # Улучшенная версия
+        self.alternatives: List[str] = []  # Альтернативные варианты
+        self.code_version = ''  # Адаптация под код
+        self.analysis_version = ''  # Адаптация под анализ
+        self.creative_version = ''  # Адаптация под креатив
+        self.success = False  # Флаг успешности
+        self.error: Optional[str] = None  # Сообщение об ошибке (если есть)
+
 
 class PromptImprover:
     """Класс для улучшения промтов с помощью AI."""
@@ -43,7 +108,25 @@ class PromptImprover:
         'creative': """Ты эксперт по креативным промптам.
 Адаптируй следующий промпт для творческих задач. Добавь образность, метафоры,
 творческие элементы, требования к стилю и тону.
-Верни только адаптированный промпт."""
+Верни только адаптированный промпт.""",
+        
+        'batch': """Ты эксперт по написанию эффективных промптов для AI.
+Для следующего промпта подготовь пять вариантов и верни их строго в таком формате:
+<<<IMPROVED>>>
+Улучшенный вариант: более четкий, конкретный и структурированный, с сохранением основной идеи.
+<<<ALTERNATIVES>>>
+1. Первый альтернативный вариант формулировки
+2. Второй альтернативный вариант формулировки
+3. Третий альтернативный вариант формулировки
+<<<CODE>>>
+Адаптация для работы с кодом: технические детали, специфика языков, требования к формату ответа.
+<<<ANALYSIS>>>
+Адаптация для аналитических задач: структура, критерии оценки, формат вывода данных.
+<<<CREATIVE>>>
+Адаптация для творческих задач: образность, творческие элементы, требования к стилю и тону.
+<<<END>>>
+
+Маркеры секций пиши точно как указано. Без дополнительных комментариев, объяснений или заголовков."""
     }
     
     def __init__(self, model_manager: ModelManager):
@@ -54,44 +137,75 @@ class PromptImprover:
             model_manager: Менеджер моделей для отправки запросов
         """
         self.model_manager = model_manager
+        # LRU-кэш успешных ответов: (ID модели, тип инструкции, промт) -> ответ
+        self._cache: "OrderedDict[tuple, Dict]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+    
+    def _call_model(self, model_id: int, kind: str, prompt: str) -> Dict:
+        """
+        Отправить промт в модель с инструкцией из SYSTEM_PROMPTS и кэшированием успешных ответов.
+        Повторное улучшение того же промта той же моделью не вызывает API.
+        
+        Инструкция передается отдельным системным сообщением: неизменный префикс
+        запроса позволяет провайдерам с кэшированием промптов не обрабатывать его заново.
+        
+        Args:
+            model_id: ID модели
+            kind: Ключ инструкции в SYSTEM_PROMPTS
+            prompt: Исходный промт
+            
+        Returns:
+            Словарь с результатом (см. ModelManager.send_to_model)
+        """
+        key = (model_id, kind, prompt)
+        with self._cache_lock:
+            cached = self._cache.get(key)
+            if cached is not None:
+                self._cache.move_to_end(key)
+                return cached
+        
+        response = self.model_manager.send_to_model(
+            model_id,
+            _SOURCE_PROMPT_PREFIX + prompt,
+            system_prompt=self.SYSTEM_PROMPTS[kind]
+        )
+        
+        if response.get('success'):
+            with self._cache_lock:
+                self._cache[key] = response
+                self._cache.move_to_end(key)
+                while len(self._cache) > RESPONSE_CACHE_SIZE:
+                    self._cache.popitem(last=False)
+        return response
     
-    def improve_prompt(self, prompt: str, model_name: Optional[str] = None) -> Dict[str, any]:
+    def improve_prompt(self, prompt: str, model_name: Optional[str] = None,
+                       on_partial: Optional[Callable[[str, object], None]] = None,
+                       cancel: Optional[threading.Event] = None) -> ImproveResult:
         """
         Улучшить промт и получить все варианты.
         
         Args:
             prompt: Исходный промт
             model_name: Название модели для улучшения (если None, используется первая активная)
+            on_partial: Функция (ключ, значение), вызываемая по мере готовности каждого
+                непустого варианта (ключи - имена атрибутов ImproveResult)
+            cancel: Событие отмены; после его установки новые запросы не выполняются,
+                а ожидание оставшихся прекращается
             
         Returns:
-            Словарь с ключами:
-                - improved: улучшенная версия
-                - alternatives: список альтернативных вариантов
-                - code_version: адаптация под код
-                - analysis_version: адаптация под анализ
-                - creative_version: адаптация под креатив
-                - success: флаг успешности
-                - error: сообщение об ошибке (если есть)
+            Экземпляр ImproveResult
         """
-        result = {
-            'improved': '',
-            'alternatives': [],
-            'code_version': '',
-            'analysis_version': '',
-            'creative_version': '',
-            'success': False,
-            'error': None
-        }
+        result = ImproveResult()
         
         if not prompt or not prompt.strip():
-            result['error'] = "Промт не может быть пустым"
+            result.error = "Промт не может быть пустым"
             return result
         
         try:
             # Определяем модель для использования
             active_models = self.model_manager.get_active_models()
             if not active_models:
-                result['error'] = "Нет активных моделей для улучшения промта"
+                result.error = "Нет активных моделей для улучшения промта"
                 return result
             
             # Выбираем модель
@@ -106,41 +220,163 @@ class PromptImprover:
                 selected_model = active_models[0]  # Используем первую активную модель
             
             logger.info(f"Используем модель {selected_model['name']} для улучшения промта")
+            model_id = selected_model['id']
             
-            # Получаем улучшенную версию
-            improved = self.get_improved_version(prompt, selected_model['id'])
-            if improved:
-                result['improved'] = improved
-                result['success'] = True
-            else:
-                result['error'] = "Не удалось получить улучшенную версию"
+            # Сначала все пять вариантов запрашиваются одним запросом; если ответ
+            # не удалось разобрать, выполняются пять отдельных запросов. В худшем
+            # случае это 6 запросов (1 пакетный + 5 отдельных) вместо прежних 5
+            values = self._improve_batched(prompt, model_id, cancel)
+            if cancel and cancel.is_set():
+                result.error = "Улучшение промта отменено"
                 return result
             
-            # Получаем альтернативные варианты
-            alternatives = self.get_alternatives(prompt, selected_model['id'])
-            if alternatives:
-                result['alternatives'] = alternatives
-            
-            # Получаем адаптированные версии
-            code_version = self.adapt_for_model_type(prompt, 'code', selected_model['id'])
-            if code_version:
-                result['code_version'] = code_version
+            if values is None:
+                logger.info("Пакетный ответ не разобран, выполняем отдельные запросы")
+                values = self._improve_separately(prompt, model_id, on_partial, cancel)
+                if cancel and cancel.is_set():
+                    result.error = "Улучшение промта отменено"
+                    return result
+            elif on_partial:
+                for key, value in values.items():
+                    if value:
+                        on_partial(key, value)
             
-            analysis_version = self.adapt_for_model_type(prompt, 'analysis', selected_model['id'])
-            if analysis_version:
-                result['analysis_version'] = analysis_version
+            # Улучшенная версия обязательна
+            if not values['improved']:
+                result.error = "Не удалось получить улучшенную версию"
+                return result
             
-            creative_version = self.adapt_for_model_type(prompt, 'creative', selected_model['id'])
-            if creative_version:
-                result['creative_version'] = creative_version
+            result.success = True
+            for key, value in values.items():
+                if value:
+                    setattr(result, key, value)
             
         except Exception as e:
             logger.error(f"Ошибка при улучшении промта: {str(e)}")
-            result['error'] = f"Ошибка при улучшении промта: {str(e)}"
+            result.error = f"Ошибка при улучшении промта: {str(e)}"
         
         return result
     
-    def get_improved_version(self, prompt: str, model_id: Optional[int] = None) -> Optional[str]:
+    def _improve_batched(self, prompt: str, model_id: int,
+                         cancel: Optional[threading.Event] = None) -> Optional[Dict[str, object]]:
+        """
+        Получить все варианты промта одним запросом к модели.
+        
+        Args:
+            prompt: Исходный промт
+            model_id: ID модели для использования
+            cancel: Событие отмены (см. improve_prompt)
+            
+        Returns:
+            Словарь вариантов (ключи - имена атрибутов ImproveResult) или None, если запрос
+            не удался, был отменен или ответ не соответствует формату с маркерами
+        """
+        # Запрос выполняется в общем пуле ModelManager, а не в отдельном пуле на вызов
+        future = self.model_manager._get_executor().submit(self._call_model, model_id, 'batch', prompt)
+        try:
+            # Ожидание прерывается периодически, чтобы заметить отмену
+            while not future.done():
+                if cancel and cancel.is_set():
+                    # Еще не начатый запрос снимается с очереди, начатый не ждем
+                    future.cancel()
+                    return None
+                wait([future], timeout=CANCEL_POLL_INTERVAL)
+            response = future.result()
+            if not (response.get('success') and response.get('response')):
+                return None
+            return self._parse_batch(response['response'])
+        except Exception as e:
+            logger.error(f"Ошибка пакетного улучшения промта: {str(e)}")
+            return None
+    
+    def _improve_separately(self, prompt: str, model_id: int,
+                            on_partial: Optional[Callable[[str, object], None]] = None,
+                            cancel: Optional[threading.Event] = None) -> Dict[str, object]:
+        """
+        Получить варианты промта пятью отдельными параллельными запросами.
+        
+        Args:
+            prompt: Исходный промт
+            model_id: ID модели для использования
+            on_partial: Функция (ключ, значение) для каждого готового непустого варианта
+            cancel: Событие отмены (см. improve_prompt)
+            
+        Returns:
+            Словарь вариантов (ключи - имена атрибутов ImproveResult, None при ошибке или отмене)
+        """
+        # Все пять запросов независимы и ограничены сетью - выполняем их параллельно
+        tasks = {
+            'improved': (self.get_improved_version, prompt, model_id),
+            'alternatives': (self.get_alternatives, prompt, model_id),
+            'code_version': (self.adapt_for_model_type, prompt, 'code', model_id),
+            'analysis_version': (self.adapt_for_model_type, prompt, 'analysis', model_id),
+            'creative_version': (self.adapt_for_model_type, prompt, 'creative', model_id),
+        }
+        values = dict.fromkeys(tasks)
+        executor = ThreadPoolExecutor(max_workers=len(tasks))
+        futures = {
+            executor.submit(func, *args): key
+            for key, (func, *args) in tasks.items()
+        }
+        pending = set(futures)
+        try:
+            # Результаты обрабатываются в порядке готовности; ожидание прерывается
+            # периодически, чтобы заметить отмену
+            while pending and not (cancel and cancel.is_set()):
+                done, pending = wait(pending, timeout=CANCEL_POLL_INTERVAL, return_when=FIRST_COMPLETED)
+                for future in done:
+                    key = futures[future]
+                    # Ошибка одного запроса не должна отменять остальные
+                    try:
+                        values[key] = future.result()
+                    except Exception as e:
+                        logger.error(f"Ошибка при получении '{key}': {str(e)}")
+                        values[key] = None
+                    if on_partial and values[key]:
+                        on_partial(key, values[key])
+        finally:
+            # При отмене не ждем запросы, которые уже отправлены
+            cancelled = bool(cancel and cancel.is_set())
+            executor.shutdown(wait=not cancelled, cancel_futures=cancelled)
+        return values
+    
+    def _parse_batch(self, text: str, count: int = 3) -> Optional[Dict[str, object]]:
+        """
+        Разделить пакетный ответ модели на секции по маркерам.
+        
+        Args:
+            text: Ответ модели на SYSTEM_PROMPTS['batch']
+            count: Количество альтернатив
+            
+        Returns:
+            Словарь вариантов или None, если маркеры не найдены
+        """
+        _, found, rest = text.partition(_BATCH_SECTIONS[0][1])
+        if not found:
+            return None
+        
+        sections = {}
+        next_markers = [marker for _, marker in _BATCH_SECTIONS[1:]] + [_BATCH_END]
+        for (key, _), next_marker in zip(_BATCH_SECTIONS, next_markers):
+            segment, found, rest = rest.partition(next_marker)
+            # Маркер конца необязателен: модель могла его опустить
+            if not found and next_marker != _BATCH_END:
+                return None
+            sections[key] = segment.strip()
+        
+        improved = _PREFIX_IMPROVED.sub('', sections['improved']).strip()
+        if not improved:
+            return None
+        
+        values: Dict[str, object] = {
+            'improved': improved,
+            'alternatives': self._parse_numbered_list(sections['alternatives'], count),
+        }
+        for key in ('code_version', 'analysis_version', 'creative_version'):
+            values[key] = _PREFIX_ADAPTED.sub('', sections[key]).strip() or None
+        return values
+    
+    def get_improved_version(self, prompt: str, model_id: int) -> Optional[str]:
         """
         Получить улучшенную версию промта.
         
@@ -152,23 +388,12 @@ class PromptImprover:
             Улучшенный промт или None при ошибке
         """
         try:
-            system_prompt = self.SYSTEM_PROMPTS['improve']
-            full_prompt = f"{system_prompt}\n\nИсходный промпт:\n{prompt}"
-            
-            if model_id:
-                response = self.model_manager.send_to_model(model_id, full_prompt)
-            else:
-                # Используем первую активную модель
-                active_models = self.model_manager.get_active_models()
-                if not active_models:
-                    return None
-                response = self.model_manager.send_to_model(active_models[0]['id'], full_prompt)
+            response = self._call_model(model_id, 'improve', prompt)
             
             if response.get('success') and response.get('response'):
                 improved_text = response['response'].strip()
                 # Убираем возможные префиксы типа "Улучшенный промпт:" или "Вот улучшенный вариант:"
-                improved_text = re.sub(r'^(Улучшенный промпт|Вот улучшенный вариант|Улучшенная версия):\s*', 
-                                      '', improved_text, flags=re.IGNORECASE)
+                improved_text = _PREFIX_IMPROVED.sub('', improved_text)
                 return improved_text.strip()
             
             return None
@@ -176,7 +401,7 @@ class PromptImprover:
             logger.error(f"Ошибка получения улучшенной версии: {str(e)}")
             return None
     
-    def get_alternatives(self, prompt: str, model_id: Optional[int] = None, count: int = 3) -> List[str]:
+    def get_alternatives(self, prompt: str, model_id: int, count: int = 3) -> List[str]:
         """
         Получить альтернативные варианты промта.
         
@@ -189,16 +414,7 @@ class PromptImprover:
             Список альтернативных вариантов
         """
         try:
-            system_prompt = self.SYSTEM_PROMPTS['alternatives']
-            full_prompt = f"{system_prompt}\n\nИсходный промпт:\n{prompt}"
-            
-            if model_id:
-                response = self.model_manager.send_to_model(model_id, full_prompt)
-            else:
-                active_models = self.model_manager.get_active_models()
-                if not active_models:
-                    return []
-                response = self.model_manager.send_to_model(active_models[0]['id'], full_prompt)
+            response = self._call_model(model_id, 'alternatives', prompt)
             
             if response.get('success') and response.get('response'):
                 text = response['response'].strip()
@@ -211,7 +427,7 @@ class PromptImprover:
             logger.error(f"Ошибка получения альтернатив: {str(e)}")
             return []
     
-    def adapt_for_model_type(self, prompt: str, model_type: str, model_id: Optional[int] = None) -> Optional[str]:
+    def adapt_for_model_type(self, prompt: str, model_type: str, model_id: int) -> Optional[str]:
         """
         Адаптировать промт под тип модели.
         
@@ -228,22 +444,12 @@ class PromptImprover:
             return None
         
         try:
-            system_prompt = self.SYSTEM_PROMPTS[model_type]
-            full_prompt = f"{system_prompt}\n\nИсходный промпт:\n{prompt}"
-            
-            if model_id:
-                response = self.model_manager.send_to_model(model_id, full_prompt)
-            else:
-                active_models = self.model_manager.get_active_models()
-                if not active_models:
-                    return None
-                response = self.model_manager.send_to_model(active_models[0]['id'], full_prompt)
+            response = self._call_model(model_id, model_type, prompt)
             
             if response.get('success') and response.get('response'):
                 adapted_text = response['response'].strip()
                 # Убираем возможные префиксы
-                adapted_text = re.sub(r'^(Адаптированный промпт|Вот адаптированный вариант):\s*', 
-                                     '', adapted_text, flags=re.IGNORECASE)
+                adapted_text = _PREFIX_ADAPTED.sub('', adapted_text)
                 return adapted_text.strip()
             
             return None
@@ -255,6 +461,10 @@ class PromptImprover:
         """
         Парсить нумерованный список из текста.
         
+        Текст просматривается один раз. Строки вида "1. текст" / "1) текст" начинают
+        новый пункт, следующие строки продолжают его. Если нумерованных пунктов нет,
+        пунктами считаются абзацы и маркированные строки ("- ", "* ", "• ").
+        
         Args:
             text: Текст с нумерованным списком
             max_items: Максимальное количество элементов
@@ -262,77 +472,47 @@ class PromptImprover:
         Returns:
             Список элементов
         """
-        items = []
+        numbered: List[List[str]] = []  # Пункты нумерованного списка (по строкам)
+        blocks: List[List[str]] = []  # Абзацы и маркированные пункты (запасной вариант)
+        block: List[str] = []
         
-        # Паттерны для поиска нумерованного списка
-        patterns = [
-            r'^\d+[\.\)]\s+(.+)$',  # 1. текст или 1) текст
-            r'^[-*]\s+(.+)$',  # - текст или * текст
-        ]
-        
-        # Сначала пробуем разделить по паттерну начала нового пункта списка
-        # Это более надежный способ для многострочных элементов
-        parts = re.split(r'\n(?=\d+[\.\)]\s)', text)
-        if len(parts) > 1:
-            for part in parts[1:max_items+1]:  # Пропускаем первую часть (может быть пустой или заголовком)
-                part = part.strip()
-                if part:
-                    # Убираем номер в начале
-                    cleaned = re.sub(r'^\d+[\.\)]\s+', '', part, count=1).strip()
-                    if cleaned and len(items) < max_items:
-                        items.append(cleaned)
-        
-        # Если не получилось, пробуем построчно
-        if not items:
-            lines = text.split('\n')
-            current_item = []
+        for line in text.split('\n'):
+            line = line.strip()
+            
+            if not line:
+                # Пустая строка завершает абзац
+                if block:
+                    blocks.append(block)
+                    block = []
+                if numbered:
+                    numbered[-1].append(line)
+                continue
             
-            for line in lines:
-                line = line.strip()
-                if not line:
-                    if current_item:
-                        item_text = ' '.join(current_item).strip()
-                        if item_text and len(items) < max_items:
-                            items.append(item_text)
-                        current_item = []
-                    continue
-                
-                # Проверяем, начинается ли строка с номера
-                match = re.match(r'^\d+[\.\)]\s+(.+)$', line)
-                if match:
-                    # Сохраняем предыдущий элемент
-                    if current_item:
-                        item_text = ' '.join(current_item).strip()
-                        if item_text and len(items) < max_items:
-                            items.append(item_text)
-                    # Начинаем новый
-                    current_item = [match.group(1)]
-                else:
-                    # Продолжение текущего элемента
-                    if current_item:
-                        current_item.append(line)
-                    else:
-                        # Первая строка без номера - возможно начало списка
-                        match_marker = re.match(r'^[-*•]\s+(.+)$', line)
-                        if match_marker:
-                            current_item = [match_marker.group(1)]
-                        else:
-                            current_item = [line]
+            item = _strip_number_prefix(line)
+            if item is not None:
+                # Лишние пункты все равно отбрасываются - дальше текст не просматриваем
+                if len(numbered) == max_items:
+                    break
+                numbered.append([item])
+                continue
+            if numbered:
+                numbered[-1].append(line)
+                continue
             
-            # Добавляем последний элемент
-            if current_item:
-                item_text = ' '.join(current_item).strip()
-                if item_text and len(items) < max_items:
-                    items.append(item_text)
+            # Маркированный пункт начинает новый блок
+            if line[0] in '-*•' and line[1:2].isspace():
+                if block:
+                    blocks.append(block)
+                block = [line[1:].strip()]
+            else:
+                block.append(line)
         
-        # Если все еще пусто, берем первые непустые строки
-        if not items:
-            lines = [line.strip() for line in text.split('\n') 
-                    if line.strip() and not line.strip().lower().startswith(('вариант', 'альтернатива', 'version'))]
-            items = lines[:max_items]
+        if block:
+            blocks.append(block)
         
-        # Очищаем от лишних пробелов
-        items = [item.strip() for item in items if item.strip()]
+        if numbered:
+            items = ['\n'.join(lines).strip() for lines in numbered]
+        else:
+            items = [' '.join(lines).strip() for lines in blocks]
         
-        return items[:max_items]
-
+        return [item for item in items if item][:max_items]
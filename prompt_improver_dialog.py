@@ -3,22 +3,65 @@
 Позволяет улучшить промт, получить альтернативные варианты и адаптировать под разные типы задач.
 """
 import logging
+import threading
 from PyQt5.QtWidgets import (
-    QDialog, QVBoxLayout, QHBoxLayout, QPushButton, QTextEdit, QLabel,
+    QApplication, QDialog, QVBoxLayout, QHBoxLayout, QPushButton, QTextEdit, QLabel,
     QComboBox, QMessageBox, QTabWidget, QWidget, QGroupBox, QFrame
 )
-from PyQt5.QtCore import Qt, QThread, pyqtSignal
+from PyQt5.QtCore import Qt, QThread, QTimer, pyqtSignal
 from PyQt5.QtGui import QFont
-from typing import Optional
-from prompt_improver import PromptImprover
+from typing import Callable, Optional
+from prompt_improver import ImproveResult, PromptImprover
 
 logger = logging.getLogger(__name__)
 
+# Число заранее созданных слотов для альтернативных вариантов
+ALTERNATIVE_SLOTS = 5
+
+
+class _AlternativeSlot:
+    """Переиспользуемый блок для одного альтернативного варианта (группа, текст, кнопка)."""
+    
+    def __init__(self, index: int, on_use: Callable[[str], None]):
+        """
+        Создать скрытый блок варианта.
+        
+        Args:
+            index: Номер варианта (с 1)
+            on_use: Функция, вызываемая с текстом варианта при нажатии кнопки
+        """
+        self.group = QGroupBox(f"Вариант {index}")
+        layout = QVBoxLayout()
+        self.group.setLayout(layout)
+        
+        self.text = QTextEdit()
+        self.text.setReadOnly(True)
+        self.text.setMaximumHeight(100)
+        layout.addWidget(self.text)
+        
+        use_button = QPushButton(f"✅ Использовать вариант {index}")
+        use_button.clicked.connect(lambda: on_use(self.text.toPlainText()))
+        layout.addWidget(use_button)
+        
+        self.group.setVisible(False)
+    
+    def show_text(self, text: str):
+        """Показать блок с текстом варианта."""
+        self.text.setPlainText(text)
+        self.group.setVisible(True)
+    
+    def clear(self):
+        """Скрыть блок и очистить текст."""
+        self.group.setVisible(False)
+        self.text.clear()
+
 
 class ImprovePromptThread(QThread):
     """Поток для асинхронного улучшения промта."""
     
-    finished = pyqtSignal(dict)  # Сигнал с результатами
+    # Завершение сообщается встроенным сигналом QThread.finished,
+    # результат читается из атрибута result
+    partial = pyqtSignal(str, object)  # Сигнал с готовым вариантом (ключ, значение)
     
     def __init__(self, improver: PromptImprover, prompt: str, model_name: Optional[str] = None):
         """
@@ -33,11 +76,20 @@ class ImprovePromptThread(QThread):
         self.improver = improver
         self.prompt = prompt
         self.model_name = model_name
+        self.result: Optional[ImproveResult] = None  # Результат improve_prompt после завершения
+        self._cancel = threading.Event()
     
     def run(self):
         """Выполнение улучшения в отдельном потоке."""
-        result = self.improver.improve_prompt(self.prompt, self.model_name)
-        self.finished.emit(result)
+        self.result = self.improver.improve_prompt(
+            self.prompt, self.model_name,
+            on_partial=self.partial.emit,
+            cancel=self._cancel
+        )
+    
+    def cancel(self):
+        """Попросить поток завершиться: оставшиеся запросы не выполняются и не ожидаются."""
+        self._cancel.set()
 
 
 class PromptImproverDialog(QDialog):
@@ -96,14 +148,9 @@ class PromptImproverDialog(QDialog):
         model_layout.addWidget(model_label)
         
         self.model_combo = QComboBox()
-        # Загружаем активные модели
-        active_models = self.improver.model_manager.get_active_models()
-        for model in active_models:
-            self.model_combo.addItem(model['name'], model['name'])
-        
-        if not active_models:
-            self.model_combo.addItem("Нет активных моделей", None)
-            self.model_combo.setEnabled(False)
+        # Активные модели загружаются после показа диалога (см. _populate_models)
+        self.model_combo.addItem("Загрузка...", None)
+        QTimer.singleShot(0, self._populate_models)
         
         model_layout.addWidget(self.model_combo)
         model_layout.addStretch()
@@ -116,9 +163,32 @@ class PromptImproverDialog(QDialog):
         
         layout.addLayout(model_layout)
         
-        # Вкладки с результатами
+        # Вкладки с результатами строятся после загрузки моделей (см. _populate_models)
+        self.tabs: Optional[QTabWidget] = None
+        self._results_index = layout.count()
+        
+        # Кнопки диалога
+        button_layout = QHBoxLayout()
+        
+        copy_button = QPushButton("📋 Копировать исходный")
+        copy_button.clicked.connect(lambda: self.copy_to_clipboard(self.original_prompt))
+        button_layout.addWidget(copy_button)
+        
+        button_layout.addStretch()
+        
+        cancel_button = QPushButton("Отмена")
+        cancel_button.clicked.connect(self.reject)
+        button_layout.addWidget(cancel_button)
+        
+        self.ok_button = QPushButton("Использовать выбранный")
+        self.ok_button.clicked.connect(self.accept_selected)
+        button_layout.addWidget(self.ok_button)
+        
+        layout.addLayout(button_layout)
+    
+    def _build_result_tabs(self):
+        """Создать вкладки с результатами улучшения."""
         self.tabs = QTabWidget()
-        layout.addWidget(self.tabs)
         
         # Вкладка: Улучшенная версия
         self.improved_tab = QWidget()
@@ -154,6 +224,18 @@ class PromptImproverDialog(QDialog):
         self.alternatives_widget.setLayout(self.alternatives_layout)
         alternatives_layout.addWidget(self.alternatives_widget)
         
+        # Блоки вариантов создаются один раз и переиспользуются между запусками
+        self.alternative_slots = [
+            _AlternativeSlot(idx, self.use_prompt) for idx in range(1, ALTERNATIVE_SLOTS + 1)
+        ]
+        for slot in self.alternative_slots:
+            self.alternatives_layout.addWidget(slot.group)
+        
+        self.no_alternatives_label = QLabel("Альтернативные варианты не найдены")
+        self.no_alternatives_label.setStyleSheet("color: gray;")
+        self.no_alternatives_label.setVisible(False)
+        self.alternatives_layout.addWidget(self.no_alternatives_label)
+        
         self.tabs.addTab(self.alternatives_tab, "Альтернативы")
         
         # Вкладка: Адаптации
@@ -220,24 +302,34 @@ class PromptImproverDialog(QDialog):
         
         self.tabs.addTab(self.adaptations_tab, "Адаптации")
         
-        # Кнопки диалога
-        button_layout = QHBoxLayout()
-        
-        copy_button = QPushButton("📋 Копировать исходный")
-        copy_button.clicked.connect(lambda: self.copy_to_clipboard(self.original_prompt))
-        button_layout.addWidget(copy_button)
-        
-        button_layout.addStretch()
-        
-        cancel_button = QPushButton("Отмена")
-        cancel_button.clicked.connect(self.reject)
-        button_layout.addWidget(cancel_button)
+        self.layout().insertWidget(self._results_index, self.tabs)
+    
+    def _populate_models(self):
+        """
+        Заполнить список моделей активными моделями из БД.
+        Без активных моделей вкладки результатов не создаются.
+        """
+        active_models = self.improver.model_manager.get_active_models()
+        self.model_combo.clear()
+        for model in active_models:
+            self.model_combo.addItem(model['name'], model['name'])
         
-        ok_button = QPushButton("Использовать выбранный")
-        ok_button.clicked.connect(self.accept_selected)
-        button_layout.addWidget(ok_button)
+        if not active_models:
+            self.model_combo.addItem("Нет активных моделей", None)
+            self.model_combo.setEnabled(False)
+            self.improve_button.setEnabled(False)
+            self.ok_button.setEnabled(False)
+            
+            empty_label = QLabel(
+                "Нет активных моделей для улучшения промта.\n"
+                "Добавьте модели через меню 'Настройки' → 'Управление моделями'."
+            )
+            empty_label.setAlignment(Qt.AlignCenter)
+            empty_label.setStyleSheet("color: gray;")
+            self.layout().insertWidget(self._results_index, empty_label, 1)
+            return
         
-        layout.addLayout(button_layout)
+        self._build_result_tabs()
     
     def start_improvement(self):
         """Начать процесс улучшения промта."""
@@ -252,8 +344,9 @@ class PromptImproverDialog(QDialog):
         self.improved_text.setPlaceholderText("Улучшение промта...")
         
         # Очищаем альтернативы
-        for i in reversed(range(self.alternatives_layout.count())):
-            self.alternatives_layout.itemAt(i).widget().setParent(None)
+        for slot in self.alternative_slots:
+            slot.clear()
+        self.no_alternatives_label.setVisible(False)
         
         self.code_text.clear()
         self.analysis_text.clear()
@@ -266,64 +359,50 @@ class PromptImproverDialog(QDialog):
         
         # Запускаем улучшение в отдельном потоке
         self.improve_thread = ImprovePromptThread(self.improver, self.original_prompt, model_name)
+        self.improve_thread.partial.connect(self.on_partial_result)
         self.improve_thread.finished.connect(self.on_improvement_finished)
         self.improve_thread.start()
     
-    def on_improvement_finished(self, result: dict):
-        """Обработчик завершения улучшения."""
+    def on_partial_result(self, key: str, value: object):
+        """Показать вариант, как только он готов (не дожидаясь остальных)."""
+        if key == 'improved':
+            self.improved_text.setPlainText(value)
+        elif key == 'alternatives':
+            self.show_alternatives(value)
+        elif key == 'code_version':
+            self.code_text.setPlainText(value)
+        elif key == 'analysis_version':
+            self.analysis_text.setPlainText(value)
+        elif key == 'creative_version':
+            self.creative_text.setPlainText(value)
+    
+    def show_alternatives(self, alternatives: list):
+        """Отобразить альтернативные варианты."""
+        # Заполняем первые слоты, остальные скрываем
+        for idx, slot in enumerate(self.alternative_slots):
+            if idx < len(alternatives):
+                slot.show_text(alternatives[idx])
+            else:
+                slot.clear()
+    
+    def on_improvement_finished(self):
+        """Обработчик завершения улучшения (варианты уже показаны в on_partial_result)."""
+        result = self.improve_thread.result
         self.improve_button.setEnabled(True)
         self.improve_button.setText("✨ Улучшить промт")
         self.loading_label.setVisible(False)
         
-        if not result.get('success'):
-            error = result.get('error', 'Неизвестная ошибка')
+        if result is None or not result.success:
+            error = result.error if result is not None and result.error else 'Неизвестная ошибка'
             QMessageBox.critical(self, "Ошибка", f"Не удалось улучшить промт:\n{error}")
             self.improved_text.setPlaceholderText("Ошибка при улучшении промта")
             return
         
-        # Отображаем улучшенную версию
-        improved = result.get('improved', '')
-        if improved:
-            self.improved_text.setPlainText(improved)
-        else:
+        if not result.improved:
             self.improved_text.setPlaceholderText("Не удалось получить улучшенную версию")
         
-        # Отображаем альтернативы
-        alternatives = result.get('alternatives', [])
-        if alternatives:
-            for idx, alt in enumerate(alternatives, 1):
-                alt_group = QGroupBox(f"Вариант {idx}")
-                alt_layout = QVBoxLayout()
-                alt_group.setLayout(alt_layout)
-                
-                alt_text = QTextEdit()
-                alt_text.setReadOnly(True)
-                alt_text.setPlainText(alt)
-                alt_text.setMaximumHeight(100)
-                alt_layout.addWidget(alt_text)
-                
-                use_alt_button = QPushButton(f"✅ Использовать вариант {idx}")
-                use_alt_button.clicked.connect(lambda checked, text=alt: self.use_prompt(text))
-                alt_layout.addWidget(use_alt_button)
-                
-                self.alternatives_layout.addWidget(alt_group)
-        else:
-            no_alt_label = QLabel("Альтернативные варианты не найдены")
-            no_alt_label.setStyleSheet("color: gray;")
-            self.alternatives_layout.addWidget(no_alt_label)
-        
-        # Отображаем адаптации
-        code_version = result.get('code_version', '')
-        if code_version:
-            self.code_text.setPlainText(code_version)
-        
-        analysis_version = result.get('analysis_version', '')
-        if analysis_version:
-            self.analysis_text.setPlainText(analysis_version)
-        
-        creative_version = result.get('creative_version', '')
-        if creative_version:
-            self.creative_text.setPlainText(creative_version)
+        if not result.alternatives:
+            self.no_alternatives_label.setVisible(True)
         
         QMessageBox.information(self, "Успех", "Промт успешно улучшен!")
     
@@ -354,7 +433,6 @@ class PromptImproverDialog(QDialog):
     
     def copy_to_clipboard(self, text: str):
         """Скопировать текст в буфер обмена."""
-        from PyQt5.QtWidgets import QApplication
         clipboard = QApplication.clipboard()
         clipboard.setText(text)
         QMessageBox.information(self, "Успех", "Текст скопирован в буфер обмена!")
@@ -372,7 +450,16 @@ class PromptImproverDialog(QDialog):
         """Обработчик закрытия окна."""
         # Останавливаем поток, если он запущен
         if self.improve_thread and self.improve_thread.isRunning():
-            self.improve_thread.terminate()
-            self.improve_thread.wait()
+            # Результаты отмененного улучшения закрытому диалогу не нужны
+            self.improve_thread.partial.disconnect()
+            self.improve_thread.finished.disconnect()
+            self.improve_thread.cancel()
+            if not self.improve_thread.wait(2000):
+                # Запрос к API еще не вернулся: поток завершится сам после ответа
+                # или таймаута. Передаем его приложению, чтобы объект QThread
+                # не был удален вместе с диалогом во время работы
+                logger.info("Поток улучшения промта завершится в фоне")
+                self.improve_thread.setParent(QApplication.instance())
+                self.improve_thread.finished.connect(self.improve_thread.deleteLater)
         event.accept()
 
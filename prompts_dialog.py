@@ -3,14 +3,300 @@
 Позволяет просматривать, создавать, редактировать и удалять промты.
 """
 from PyQt5.QtWidgets import (
-    QDialog, QVBoxLayout, QHBoxLayout, QPushButton, QTableWidget,
-    QTableWidgetItem, QHeaderView, QMessageBox, QLineEdit, QLabel,
-    QComboBox, QWidget, QTextEdit, QFormLayout, QGroupBox
+    QDialog, QVBoxLayout, QHBoxLayout, QPushButton, QTableView,
+    QHeaderView, QMessageBox, QLineEdit, QLabel, QComboBox, QWidget,
+    QTextEdit, QFormLayout, QGroupBox, QProgressBar
 )
-from PyQt5.QtCore import Qt
+from PyQt5.QtCore import Qt, QAbstractTableModel, QModelIndex, QThread, QTimer, pyqtSignal
 from PyQt5.QtGui import QFont
-from datetime import datetime
+from collections import defaultdict
+from functools import lru_cache
+from itertools import islice
+from typing import Dict, Iterator, List, Optional, Set
 from db import Database
+from widgets import DeleteButtonDelegate, format_table_date
+
+
+@lru_cache(maxsize=None)
+def _font(family: str, size: int, weight: int = QFont.Normal) -> QFont:
+    """
+    Получить шрифт диалогов промтов. Шрифт создается при первом обращении
+    (когда QApplication уже существует) и затем переиспользуется.
+    
+    Args:
+        family: Семейство шрифта
+        size: Размер в пунктах
+        weight: Насыщенность
+        
+    Returns:
+        Экземпляр QFont
+    """
+    return QFont(family, size, weight)
+
+
+# Колонки таблицы промтов
+COLUMN_DATE, COLUMN_PROMPT, COLUMN_TAGS, COLUMN_ACTIONS = range(4)
+
+# Задержка применения фильтра после ввода (мс): быстрый набор дает одну фильтрацию
+FILTER_DELAY_MS = 150
+
+# Сколько строк таблицы промтов показывается за один раз (остальные - при прокрутке)
+FETCH_BATCH_SIZE = 200
+
+
+class SubstringIndex:
+    """
+    Триграммный индекс для поиска подстроки в наборе строк.
+    Для каждой тройки символов хранятся номера строк, в которых она встречается.
+    """
+    
+    GRAM = 3  # Длина n-граммы
+    
+    def __init__(self, texts: List[str]):
+        """
+        Построить индекс.
+        
+        Args:
+            texts: Строки в нижнем регистре (номер строки - позиция в списке)
+        """
+        self._texts = texts
+        self._grams: Dict[str, Set[int]] = defaultdict(set)
+        n = self.GRAM
+        for i, text in enumerate(texts):
+            for gram in {text[j:j + n] for j in range(len(text) - n + 1)}:
+                self._grams[gram].add(i)
+    
+    def search(self, query: str) -> Set[int]:
+        """
+        Найти строки, содержащие подстроку.
+        
+        Args:
+            query: Подстрока в нижнем регистре
+            
+        Returns:
+            Множество номеров подходящих строк
+        """
+        n = self.GRAM
+        if len(query) < n:
+            # Короткий запрос не разбивается на n-граммы - проверяем все строки
+            return {i for i, text in enumerate(self._texts) if query in text}
+        
+        # Кандидаты - строки, содержащие все n-граммы запроса (начиная с самых редких)
+        postings = sorted(
+            (self._grams.get(query[j:j + n], set()) for j in range(len(query) - n + 1)),
+            key=len
+        )
+        candidates = set(postings[0])
+        for posting in postings[1:]:
+            if not candidates:
+                break
+            candidates &= posting
+        
+        # Порядок n-грамм не учитывается индексом - проверяем кандидатов
+        return {i for i in candidates if query in self._texts[i]}
+
+
+class TagIndex:
+    """
+    Группировка промтов по строке тегов в нижнем регистре для фильтра по подстроке:
+    каждая различная строка тегов проверяется один раз, а не для каждого промта.
+    """
+    
+    def __init__(self, tags_list: List[Optional[str]]):
+        """
+        Сгруппировать строки по строке тегов.
+        
+        Args:
+            tags_list: Строки тегов через запятую (номер строки - позиция в списке)
+        """
+        self._count = len(tags_list)
+        self._tags: Dict[str, Set[int]] = defaultdict(set)
+        for i, tags in enumerate(tags_list):
+            if tags:
+                self._tags[tags.lower()].add(i)
+    
+    def search(self, query: str) -> Set[int]:
+        """
+        Найти строки, в строке тегов которых есть подстрока запроса.
+        
+        Args:
+            query: Запрос в нижнем регистре
+            
+        Returns:
+            Множество номеров подходящих строк
+        """
+        if not query:
+            return set(range(self._count))
+        # Различных строк тегов обычно заметно меньше, чем промтов (наборы
+        # тегов повторяются) - проверяем каждую один раз, а не каждую строку
+        result: Set[int] = set()
+        for tags, rows in self._tags.items():
+            if query in tags:
+                result |= rows
+        return result
+
+
+class PromptsTableModel(QAbstractTableModel):
+    """Модель таблицы промтов: данные хранятся в списке словарей, виджеты на строки не создаются."""
+    
+    HEADERS = ["Дата", "Промт", "Теги", "Действия"]
+    
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        # Все промты в порядке текущей сортировки
+        self._source: List[Dict] = []
+        # ID промтов, подходящих под фильтр (None - фильтр не задан)
+        self._filter_ids: Optional[Set[int]] = None
+        # Строки, уже переданные представлению, и источник следующих (см. fetchMore)
+        self._rows: List[Dict] = []
+        self._pending: Iterator[Dict] = iter(())
+        self._exhausted = True
+        # Текущая сортировка (колонка, порядок), применяется и к новым данным
+        self._sort_column = COLUMN_DATE
+        self._sort_order = Qt.DescendingOrder
+    
+    def rowCount(self, parent=QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self._rows)
+    
+    def canFetchMore(self, parent=QModelIndex()) -> bool:
+        return not parent.isValid() and not self._exhausted
+    
+    def fetchMore(self, parent=QModelIndex()):
+        """Показать следующую порцию строк (вызывается представлением при прокрутке)."""
+        if parent.isValid():
+            return
+        batch = self._take_batch()
+        if not batch:
+            return
+        start = len(self._rows)
+        self.beginInsertRows(QModelIndex(), start, start + len(batch) - 1)
+        self._rows.extend(batch)
+        self.endInsertRows()
+    
+    def _take_batch(self) -> List[Dict]:
+        """Взять следующую порцию подходящих под фильтр строк."""
+        batch = list(islice(self._pending, FETCH_BATCH_SIZE))
+        if len(batch) < FETCH_BATCH_SIZE:
+            self._exhausted = True
+        return batch
+    
+    def columnCount(self, parent=QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self.HEADERS)
+    
+    def headerData(self, section: int, orientation, role=Qt.DisplayRole):
+        if orientation == Qt.Horizontal and role == Qt.DisplayRole:
+            return self.HEADERS[section]
+        return None
+    
+    def flags(self, index: QModelIndex):
+        return Qt.ItemIsEnabled | Qt.ItemIsSelectable
+    
+    def data(self, index: QModelIndex, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        prompt = self._rows[index.row()]
+        column = index.column()
+        
+        if role == Qt.DisplayRole:
+            if column == COLUMN_DATE:
+                return prompt['_date_display']
+            if column == COLUMN_PROMPT:
+                return prompt['_preview']
+            if column == COLUMN_TAGS:
+                return prompt.get('tags', '') or ''
+        elif role == Qt.ToolTipRole:
+            if column == COLUMN_PROMPT:
+                return "Двойной клик для просмотра полного текста"
+            if column == COLUMN_ACTIONS:
+                return "Удалить промт"
+        elif role == Qt.UserRole:
+            return prompt['id']
+        return None
+    
+    def sort(self, column: int, order=Qt.AscendingOrder):
+        """Отсортировать строки по колонке (колонка действий не сортируется)."""
+        if column == COLUMN_ACTIONS:
+            return
+        self._sort_column = column
+        self._sort_order = order
+        self._sort_source()
+        self.set_filter(self._filter_ids)
+    
+    def _sort_source(self):
+        """Отсортировать промты согласно текущей сортировке."""
+        key = {COLUMN_DATE: 'date', COLUMN_PROMPT: 'prompt', COLUMN_TAGS: 'tags'}[self._sort_column]
+        self._source.sort(
+            key=lambda prompt: prompt.get(key) or '',
+            reverse=self._sort_order == Qt.DescendingOrder
+        )
+    
+    def set_prompts(self, prompts: List[Dict]):
+        """Заменить набор промтов; он будет показан при следующем вызове set_filter."""
+        self._source = list(prompts)
+        self._sort_source()
+    
+    def set_filter(self, prompt_ids: Optional[Set[int]]):
+        """
+        Показать только промты с указанными ID (одно обновление представления).
+        Строки отбираются лениво: проверяется только то, что попадает в очередную порцию.
+        
+        Args:
+            prompt_ids: Множество ID промтов или None, чтобы показать все
+        """
+        self.beginResetModel()
+        self._filter_ids = prompt_ids
+        if prompt_ids is None:
+            self._pending = iter(self._source)
+        else:
+            self._pending = (p for p in self._source if p['id'] in prompt_ids)
+        self._exhausted = False
+        self._rows = self._take_batch()
+        self.endResetModel()
+    
+    def prompt_at(self, row: int) -> Dict:
+        """Получить данные промта в строке."""
+        return self._rows[row]
+
+
+class PromptsLoadThread(QThread):
+    """Поток для загрузки промтов из БД и построения поисковых индексов."""
+    
+    loaded = pyqtSignal(list, object, object)  # Промты, индекс по тексту, индекс по тегам
+    failed = pyqtSignal(str)  # Текст ошибки загрузки
+    
+    def __init__(self, db: Database):
+        """
+        Инициализация потока.
+        
+        Args:
+            db: Экземпляр класса Database
+        """
+        super().__init__()
+        self.db = db
+    
+    def run(self):
+        """Загрузка промтов в отдельном потоке."""
+        try:
+            try:
+                prompts = self.db.get_prompts(order_by="date DESC")
+            finally:
+                # Соединение с БД создается отдельно для каждого потока
+                self.db.close()
+            
+            for p in prompts:
+                p['_date_display'] = format_table_date(p['date'])
+                # Промт обрезаем для отображения
+                text = p['prompt']
+                p['_preview'] = text[:100] + "..." if len(text) > 100 else text
+            
+            # Индексы по тексту и по тегам строятся один раз при загрузке,
+            # а не при каждом изменении фильтра
+            prompt_index = SubstringIndex([p['prompt'].lower() for p in prompts])
+            tags_index = TagIndex([p.get('tags') for p in prompts])
+        except Exception as e:
+            self.failed.emit(str(e))
+            return
+        self.loaded.emit(prompts, prompt_index, tags_index)
 
 
 class PromptsDialog(QDialog):
@@ -29,6 +315,19 @@ class PromptsDialog(QDialog):
         self.setWindowTitle("Управление промтами")
         self.setMinimumSize(900, 700)
         
+        # Отложенное применение фильтров при вводе текста
+        self._filter_timer = QTimer(self)
+        self._filter_timer.setSingleShot(True)
+        self._filter_timer.setInterval(FILTER_DELAY_MS)
+        self._filter_timer.timeout.connect(self.apply_filters)
+        
+        # Промты и индексы заполняются после загрузки в фоновом потоке
+        self.all_prompts: List[Dict] = []
+        self._prompt_index = SubstringIndex([])
+        self._tags_index = TagIndex([])
+        self._load_thread: Optional[PromptsLoadThread] = None
+        self._reload_pending = False
+        
         self.init_ui()
         self.load_prompts()
     
@@ -44,7 +343,7 @@ class PromptsDialog(QDialog):
         
         # Заголовок фильтров
         filter_label = QLabel("Фильтры:")
-        filter_label.setFont(QFont("Arial", 10, QFont.Bold))
+        filter_label.setFont(_font("Arial", 10, QFont.Bold))
         filter_layout.addWidget(filter_label)
         
         # Строка фильтров
@@ -55,7 +354,7 @@ class PromptsDialog(QDialog):
         filter_row.addWidget(search_label)
         self.search_input = QLineEdit()
         self.search_input.setPlaceholderText("Поиск по тексту промта...")
-        self.search_input.textChanged.connect(self.apply_filters)
+        self.search_input.textChanged.connect(lambda: self._filter_timer.start())
         filter_row.addWidget(self.search_input)
         
         # Фильтр по тегам
@@ -63,7 +362,7 @@ class PromptsDialog(QDialog):
         filter_row.addWidget(tags_label)
         self.tags_filter_input = QLineEdit()
         self.tags_filter_input.setPlaceholderText("Фильтр по тегам...")
-        self.tags_filter_input.textChanged.connect(self.apply_filters)
+        self.tags_filter_input.textChanged.connect(lambda: self._filter_timer.start())
         filter_row.addWidget(self.tags_filter_input)
         
         # Кнопка очистки фильтров
@@ -73,27 +372,53 @@ class PromptsDialog(QDialog):
         
         filter_row.addStretch()
         
+        # Индикатор загрузки промтов
+        self.load_progress = QProgressBar()
+        self.load_progress.setRange(0, 0)
+        self.load_progress.setMaximumWidth(120)
+        self.load_progress.setFormat("Загрузка...")
+        self.load_progress.setVisible(False)
+        filter_row.addWidget(self.load_progress)
+        
         filter_layout.addLayout(filter_row)
         layout.addWidget(filter_panel)
         
         # Таблица промтов
-        self.prompts_table = QTableWidget()
-        self.prompts_table.setColumnCount(4)
-        self.prompts_table.setHorizontalHeaderLabels([
-            "Дата", "Промт", "Теги", "Действия"
-        ])
+        self.prompts_model = PromptsTableModel(self)
+        self.prompts_table = QTableView()
+        self.prompts_table.setModel(self.prompts_model)
+        
+        # Кнопка удаления рисуется делегатом
+        delete_delegate = DeleteButtonDelegate(self.prompts_table)
+        # Подтверждение удаления показывается после обработки щелчка таблицей
+        delete_delegate.delete_requested.connect(self.delete_prompt_by_id, Qt.QueuedConnection)
+        self.prompts_table.setItemDelegateForColumn(COLUMN_ACTIONS, delete_delegate)
         
         # Настройка колонок
+        # Ширина даты и кнопки известна заранее: фиксированные колонки не требуют
+        # просмотра всех строк при каждом обновлении данных
         header = self.prompts_table.horizontalHeader()
-        header.setSectionResizeMode(0, QHeaderView.ResizeToContents)  # Дата
-        header.setSectionResizeMode(1, QHeaderView.Stretch)  # Промт
-        header.setSectionResizeMode(2, QHeaderView.ResizeToContents)  # Теги
-        header.setSectionResizeMode(3, QHeaderView.ResizeToContents)  # Действия
+        header.setSectionResizeMode(COLUMN_DATE, QHeaderView.Fixed)
+        header.setSectionResizeMode(COLUMN_PROMPT, QHeaderView.Stretch)
+        header.setSectionResizeMode(COLUMN_TAGS, QHeaderView.ResizeToContents)
+        header.setSectionResizeMode(COLUMN_ACTIONS, QHeaderView.Fixed)
+        date_width = self.prompts_table.fontMetrics().horizontalAdvance("0000-00-00 00:00")
+        header.resizeSection(COLUMN_DATE, date_width + 24)
+        actions_width = header.fontMetrics().horizontalAdvance(PromptsTableModel.HEADERS[COLUMN_ACTIONS])
+        header.resizeSection(COLUMN_ACTIONS, actions_width + 24)
+        
+        # Одинаковая фиксированная высота строк: представление не запрашивает
+        # размер каждой строки
+        vertical_header = self.prompts_table.verticalHeader()
+        vertical_header.setSectionResizeMode(QHeaderView.Fixed)
+        vertical_header.setDefaultSectionSize(60)
         
         self.prompts_table.setAlternatingRowColors(True)
-        self.prompts_table.setSelectionBehavior(QTableWidget.SelectRows)
+        self.prompts_table.setSelectionBehavior(QTableView.SelectRows)
         self.prompts_table.setSortingEnabled(True)
         self.prompts_table.setWordWrap(True)
+        # Двойной клик для просмотра полного промта
+        self.prompts_table.doubleClicked.connect(self.view_full_prompt)
         layout.addWidget(self.prompts_table)
         
         # Кнопки CRUD
@@ -129,89 +454,71 @@ class PromptsDialog(QDialog):
         layout.addWidget(close_button)
     
     def load_prompts(self):
-        """Загрузить список промтов из БД."""
-        self.all_prompts = self.db.get_prompts(order_by="date DESC")
+        """Загрузить список промтов из БД (в фоновом потоке, окно не блокируется)."""
+        if self._load_thread is not None and self._load_thread.isRunning():
+            # Загрузка уже идет - повторим ее после завершения, чтобы учесть изменения
+            self._reload_pending = True
+            return
+        
+        self.load_progress.setVisible(True)
+        self._load_thread = PromptsLoadThread(self.db)
+        self._load_thread.loaded.connect(self.on_prompts_loaded)
+        self._load_thread.failed.connect(self.on_prompts_failed)
+        self._load_thread.start()
+    
+    def on_prompts_loaded(self, prompts: List[Dict], prompt_index: SubstringIndex,
+                          tags_index: TagIndex):
+        """Обработчик завершения загрузки промтов."""
+        # Поток отправил результат и завершается
+        self._load_thread.wait()
+        
+        self.all_prompts = prompts
+        self._prompt_index = prompt_index
+        self._tags_index = tags_index
+        self.prompts_model.set_prompts(self.all_prompts)
         self.apply_filters()
+        
+        if self._reload_pending:
+            self._reload_pending = False
+            self.load_prompts()
+        else:
+            self.load_progress.setVisible(False)
+    
+    def on_prompts_failed(self, error: str):
+        """Обработчик ошибки загрузки промтов."""
+        self._load_thread.wait()
+        
+        if self._reload_pending:
+            # Данные могли измениться после начала загрузки - пробуем еще раз
+            self._reload_pending = False
+            self.load_prompts()
+            return
+        
+        self.load_progress.setVisible(False)
+        QMessageBox.critical(self, "Ошибка", f"Ошибка при загрузке промтов:\n{error}")
     
     def apply_filters(self):
         """Применить фильтры к промтам."""
-        filtered_prompts = self.all_prompts.copy()
-        
-        # Фильтр по поиску
+        self._filter_timer.stop()
         search_text = self.search_input.text().strip().lower()
-        if search_text:
-            filtered_prompts = [
-                p for p in filtered_prompts
-                if search_text in p['prompt'].lower()
-            ]
-        
-        # Фильтр по тегам
         tags_filter = self.tags_filter_input.text().strip().lower()
-        if tags_filter:
-            filtered_prompts = [
-                p for p in filtered_prompts
-                if p.get('tags') and tags_filter in p['tags'].lower()
-            ]
-        
-        # Обновляем таблицу
-        self.update_table(filtered_prompts)
-    
-    def update_table(self, prompts):
-        """Обновить таблицу промтов."""
-        self.prompts_table.setRowCount(len(prompts))
-        
-        for row, prompt in enumerate(prompts):
-            # Дата
-            date_str = prompt['date']
-            if date_str:
-                try:
-                    dt = datetime.strptime(date_str, "%Y-%m-%d %H:%M:%S")
-                    date_display = dt.strftime("%Y-%m-%d %H:%M")
-                except:
-                    date_display = date_str[:10]
-            else:
-                date_display = "N/A"
-            
-            date_item = QTableWidgetItem(date_display)
-            date_item.setData(Qt.UserRole, prompt['id'])  # Сохраняем ID
-            date_item.setFlags(date_item.flags() & ~Qt.ItemIsEditable)
-            self.prompts_table.setItem(row, 0, date_item)
-            
-            # Промт (обрезаем для отображения)
-            prompt_text = prompt['prompt'][:100] + "..." if len(prompt['prompt']) > 100 else prompt['prompt']
-            prompt_item = QTableWidgetItem(prompt_text)
-            prompt_item.setFlags(prompt_item.flags() & ~Qt.ItemIsEditable)
-            prompt_item.setData(Qt.UserRole + 1, prompt['prompt'])  # Сохраняем полный текст
-            prompt_item.setToolTip("Двойной клик для просмотра полного текста")
-            self.prompts_table.setItem(row, 1, prompt_item)
-            
-            # Теги
-            tags_item = QTableWidgetItem(prompt.get('tags', '') or '')
-            tags_item.setFlags(tags_item.flags() & ~Qt.ItemIsEditable)
-            self.prompts_table.setItem(row, 2, tags_item)
-            
-            # Кнопка удаления
-            delete_button = QPushButton("🗑️")
-            delete_button.setMaximumWidth(30)
-            delete_button.clicked.connect(
-                lambda checked, p_id=prompt['id']: self.delete_prompt_by_id(p_id)
-            )
-            self.prompts_table.setCellWidget(row, 3, delete_button)
-            
-            # Устанавливаем высоту строки
-            self.prompts_table.setRowHeight(row, 60)
         
-        # Автоматически подгоняем ширину колонок
-        self.prompts_table.resizeColumnToContents(0)
-        self.prompts_table.resizeColumnToContents(2)
+        # Номера промтов, подходящих под оба фильтра (None - фильтры не заданы)
+        matched: Optional[Set[int]] = None
+        if search_text:
+            matched = self._prompt_index.search(search_text)
+        if tags_filter:
+            tags_matched = self._tags_index.search(tags_filter)
+            matched = tags_matched if matched is None else matched & tags_matched
         
-        # Обработчик двойного клика для просмотра полного промта
-        self.prompts_table.itemDoubleClicked.connect(self.view_full_prompt)
+        if matched is not None:
+            matched = {self.all_prompts[i]['id'] for i in matched}
+        self.prompts_model.set_filter(matched)
     
-    def view_full_prompt(self, item):
+    def view_full_prompt(self, index: QModelIndex):
         """Просмотр полного текста промта."""
-        if item.column() == 1:  # Колонка "Промт"
-            full_text = item.data(Qt.UserRole + 1) or item.text()
+        if index.column() == COLUMN_PROMPT:
+            full_text = self.prompts_model.prompt_at(index.row())['prompt']
             
             dialog = QDialog(self)
             dialog.setWindowTitle("Полный текст промта")
@@ -223,7 +530,7 @@ class PromptsDialog(QDialog):
             text_edit = QTextEdit()
             text_edit.setReadOnly(True)
             text_edit.setPlainText(full_text)
-            text_edit.setFont(QFont("Consolas", 10))
+            text_edit.setFont(_font("Consolas", 10))
             layout.addWidget(text_edit)
             
             close_button = QPushButton("Закрыть")
@@ -232,6 +539,12 @@ class PromptsDialog(QDialog):
             
             dialog.exec_()
     
+    def done(self, result: int):
+        """Закрытие диалога: дождаться потока загрузки, чтобы он не был удален во время работы."""
+        if self._load_thread is not None:
+            self._load_thread.wait()
+        super().done(result)
+    
     def clear_filters(self):
         """Очистить все фильтры."""
         self.search_input.clear()
@@ -244,11 +557,7 @@ class PromptsDialog(QDialog):
         if not selected_rows:
             return None
         
-        row = selected_rows[0].row()
-        date_item = self.prompts_table.item(row, 0)
-        if date_item:
-            return date_item.data(Qt.UserRole)
-        return None
+        return selected_rows[0].data(Qt.UserRole)
     
     def create_prompt(self):
         """Создать новый промт."""
@@ -341,23 +650,23 @@ class PromptViewDialog(QDialog):
         
         # Дата
         date_label = QLabel(f"Дата: {prompt.get('date', 'N/A')}")
-        date_label.setFont(QFont("Arial", 9))
+        date_label.setFont(_font("Arial", 9))
         layout.addWidget(date_label)
         
         # Промт
         prompt_label = QLabel("Промт:")
-        prompt_label.setFont(QFont("Arial", 10, QFont.Bold))
+        prompt_label.setFont(_font("Arial", 10, QFont.Bold))
         layout.addWidget(prompt_label)
         
         prompt_text = QTextEdit()
         prompt_text.setReadOnly(True)
         prompt_text.setPlainText(prompt.get('prompt', ''))
-        prompt_text.setFont(QFont("Consolas", 10))
+        prompt_text.setFont(_font("Consolas", 10))
         layout.addWidget(prompt_text)
         
         # Теги
         tags_label = QLabel("Теги:")
-        tags_label.setFont(QFont("Arial", 10, QFont.Bold))
+        tags_label.setFont(_font("Arial", 10, QFont.Bold))
         layout.addWidget(tags_label)
         
         tags_text = QLineEdit()
@@ -387,7 +696,7 @@ class PromptEditDialog(QDialog):
         
         # Промт
         prompt_label = QLabel("Промт: *")
-        prompt_label.setFont(QFont("Arial", 10, QFont.Bold))
+        prompt_label.setFont(_font("Arial", 10, QFont.Bold))
         layout.addWidget(prompt_label)
         
         self.prompt_text = QTextEdit()
@@ -399,7 +708,7 @@ class PromptEditDialog(QDialog):
         
         # Теги
         tags_label = QLabel("Теги:")
-        tags_label.setFont(QFont("Arial", 10, QFont.Bold))
+        tags_label.setFont(_font("Arial", 10, QFont.Bold))
         layout.addWidget(tags_label)
         
         self.tags_input = QLineEdit()
@@ -88,8 +88,11 @@ class SettingsDialog(QDialog):
     def load_settings(self):
         """Загрузить настройки из базы данных."""
         try:
+            # Все настройки читаются одним запросом
+            settings = self.db.get_all_settings()
+            
             # Загружаем тему
-            theme = self.db.get_setting("theme", "light")
+            theme = settings.get("theme") or "light"
             index = self.theme_combo.findData(theme)
             if index >= 0:
                 self.theme_combo.setCurrentIndex(index)
@@ -97,7 +100,7 @@ class SettingsDialog(QDialog):
                 self.theme_combo.setCurrentIndex(0)  # По умолчанию светлая
             
             # Загружаем размер шрифта
-            font_size = self.db.get_setting("font_size", "10")
+            font_size = settings.get("font_size") or "10"
             try:
                 font_size_int = int(font_size)
                 if 8 <= font_size_int <= 20:
@@ -110,13 +113,11 @@ class SettingsDialog(QDialog):
     def save_settings(self):
         """Сохранить настройки в базу данных."""
         try:
-            # Сохраняем тему
             theme = self.theme_combo.currentData()
-            self.db.set_setting("theme", theme)
-            
-            # Сохраняем размер шрифта
             font_size = str(self.font_size_spin.value())
-            self.db.set_setting("font_size", font_size)
+            
+            # Тема и размер шрифта сохраняются одной транзакцией
+            self.db.set_settings({"theme": theme, "font_size": font_size})
             
             logger.info(f"Настройки сохранены: theme={theme}, font_size={font_size}")
             return True
@@ -2,17 +2,319 @@
 Тестовая программа для просмотра и редактирования SQLite баз данных.
 Позволяет просматривать таблицы, данные с пагинацией и выполнять CRUD операции.
 """
+import csv
 import sys
 import sqlite3
+from contextlib import contextmanager
+from pathlib import Path
 from PyQt5.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
-    QPushButton, QTableWidget, QTableWidgetItem, QHeaderView,
+    QPushButton, QTableWidget, QTableWidgetItem, QTableView, QHeaderView,
     QMessageBox, QFileDialog, QLabel, QLineEdit, QDialog,
     QFormLayout, QTextEdit, QSpinBox, QComboBox, QGroupBox
 )
-from PyQt5.QtCore import Qt
+from PyQt5.QtCore import Qt, QAbstractTableModel, QModelIndex, QMutex, QMutexLocker, QThread, QTimer, pyqtSignal
 from PyQt5.QtGui import QFont
-from typing import List, Dict, Optional, Any
+from typing import List, Dict, Optional, Any, Tuple, Iterable, Iterator, Sequence
+
+
+# Настройки соединения: без fsync на каждый коммит, временные данные в памяти,
+# кэш страниц 64 МБ и чтение файла через mmap (256 МБ). Только настройки
+# соединения: режим журнала хранится в самом файле, просмотрщик его не меняет
+CONNECTION_PRAGMAS = (
+    "synchronous=NORMAL",
+    "temp_store=MEMORY",
+    "cache_size=-65536",
+    "mmap_size=268435456",
+)
+
+# Максимальная длина текста в ячейке таблицы (полное значение - в просмотре записи)
+MAX_CELL_TEXT = 512
+
+# Размер пачки строк при чтении всей таблицы (экспорт)
+ITER_BATCH_SIZE = 1000
+
+# Задержка перехода на страницу после ввода номера (мс): набор "150" дает одну загрузку
+PAGE_INPUT_DELAY_MS = 250
+
+
+def apply_connection_pragmas(conn: sqlite3.Connection):
+    """
+    Применить CONNECTION_PRAGMAS к соединению.
+    Неприменимые настройки (например, mmap на платформе без его поддержки)
+    пропускаются, соединение остается с настройками по умолчанию.
+    
+    Args:
+        conn: Соединение с БД
+    """
+    for pragma in CONNECTION_PRAGMAS:
+        try:
+            conn.execute(f"PRAGMA {pragma}")
+        except sqlite3.DatabaseError:
+            continue
+
+
+@contextmanager
+def immediate_transaction(conn: sqlite3.Connection):
+    """
+    Выполнить изменения в транзакции BEGIN IMMEDIATE: блокировка записи берется
+    сразу, а не при первом изменении, поэтому запись не сталкивается с чтением
+    в середине транзакции. При ошибке транзакция откатывается.
+    
+    Args:
+        conn: Соединение с БД
+    """
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        yield conn
+    except Exception:
+        conn.rollback()
+        raise
+    conn.commit()
+
+
+def _q(ident: str) -> str:
+    """Заключить идентификатор (таблицу, колонку) в кавычки для SQL."""
+    return '"' + ident.replace('"', '""') + '"'
+
+
+def build_table_sql(table_name: str) -> Dict[str, str]:
+    """
+    Составить запросы просмотра таблицы. Текст запросов не меняется при смене
+    страницы, поэтому подготовленные выражения берутся из кэша соединения.
+    
+    Args:
+        table_name: Название таблицы
+        
+    Returns:
+        Словарь с текстами запросов
+    """
+    table = _q(table_name)
+    return {
+        "count": f"SELECT COUNT(*) FROM {table}",
+        "max_rowid": f"SELECT max(rowid) FROM {table}",
+        "page_offset": f"SELECT * FROM {table} LIMIT ? OFFSET ?",
+        "rowid_first": f"SELECT *, rowid FROM {table} ORDER BY rowid LIMIT ?",
+        "rowid_after": f"SELECT *, rowid FROM {table} WHERE rowid > ? ORDER BY rowid LIMIT ?",
+        "rowid_from": f"SELECT *, rowid FROM {table} WHERE rowid >= ? ORDER BY rowid LIMIT ?",
+        "rowid_before": (f"SELECT * FROM (SELECT *, rowid AS _rowid_ FROM {table} "
+                         f"WHERE rowid < ? ORDER BY rowid DESC LIMIT ?) ORDER BY _rowid_"),
+        "rowid_offset": f"SELECT *, rowid FROM {table} ORDER BY rowid LIMIT ? OFFSET ?",
+    }
+
+
+def read_table_schema(conn: sqlite3.Connection, table_name: str) -> Dict[str, Any]:
+    """
+    Прочитать структуру таблицы одним запросом PRAGMA table_info.
+    
+    Args:
+        conn: Соединение с БД
+        table_name: Название таблицы
+        
+    Returns:
+        Словарь со структурой таблицы:
+            - columns: Названия колонок по порядку
+            - pk: Первая колонка PRIMARY KEY (или None)
+            - pk_columns: Все колонки PRIMARY KEY
+            - not_null: Колонки с NOT NULL
+            - widget_factory: Класс поля ввода для каждой колонки (QTextEdit
+              для текстовых типов, иначе QLineEdit)
+    """
+    columns_info = conn.execute(f"PRAGMA table_info({_q(table_name)})").fetchall()
+    pk_columns = [col[1] for col in columns_info if col[5]]  # pk flag
+    return {
+        "columns": [col[1] for col in columns_info],
+        "pk": pk_columns[0] if pk_columns else None,
+        "pk_columns": set(pk_columns),
+        "not_null": {col[1] for col in columns_info if col[3]},  # NOT NULL flag
+        "widget_factory": {
+            col[1]: QTextEdit if "TEXT" in col[2].upper() else QLineEdit
+            for col in columns_info
+        },
+    }
+
+
+class RowsModel(QAbstractTableModel):
+    """Модель строк текущей страницы таблицы (без отдельного объекта на ячейку)."""
+    
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._rows: List[sqlite3.Row] = []
+        self._headers: List[str] = []
+    
+    def set_rows(self, headers: List[str], rows: List[sqlite3.Row]):
+        """
+        Заменить данные модели строками новой страницы.
+        
+        Args:
+            headers: Названия колонок
+            rows: Строки страницы
+        """
+        self.beginResetModel()
+        self._headers = headers
+        self._rows = rows
+        self.endResetModel()
+    
+    def append_rows(self, rows: List[sqlite3.Row]):
+        """
+        Добавить строки в конец модели.
+        
+        Args:
+            rows: Добавляемые строки
+        """
+        start = len(self._rows)
+        self.beginInsertRows(QModelIndex(), start, start + len(rows) - 1)
+        self._rows.extend(rows)
+        self.endInsertRows()
+    
+    def record(self, row: int) -> sqlite3.Row:
+        """Строка страницы в том виде, в каком она получена из БД."""
+        return self._rows[row]
+    
+    def headers(self) -> List[str]:
+        """Названия колонок текущей таблицы."""
+        return self._headers
+    
+    def row_values(self, row: int) -> Dict[str, Any]:
+        """
+        Получить исходные значения строки.
+        
+        Args:
+            row: Номер строки на странице
+            
+        Returns:
+            Словарь {колонка: значение}
+        """
+        # zip останавливается на последней колонке таблицы: добавленный
+        # к выборке rowid в словарь не попадает
+        return dict(zip(self._headers, self.record(row)))
+    
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._rows)
+    
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._headers)
+    
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        value = self._rows[index.row()][index.column()]
+        if role == Qt.DisplayRole:
+            if value is None:
+                return "NULL"
+            # Строки и целые числа отдаются как есть, Qt форматирует их сам;
+            # дробные числа через str, чтобы не терять знаки после запятой
+            if isinstance(value, str):
+                if len(value) > MAX_CELL_TEXT:
+                    return value[:MAX_CELL_TEXT] + "…"
+                return value
+            if isinstance(value, int):
+                return value
+            # Содержимое BLOB не переводится в текст: это может быть много мегабайт
+            if isinstance(value, (bytes, memoryview)):
+                return f"<BLOB {len(value)} bytes>"
+            return str(value)
+        if role == Qt.UserRole:
+            # Исходное значение для редактирования
+            return value
+        return None
+    
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if orientation == Qt.Horizontal and role == Qt.DisplayRole:
+            return self._headers[section]
+        return super().headerData(section, orientation, role)
+
+
+class PageLoadThread(QThread):
+    """Поток загрузки страницы таблицы, чтобы запросы не блокировали интерфейс."""
+    
+    rows_ready = pyqtSignal(list)  # Очередная пачка строк страницы
+    
+    def __init__(self, conn: sqlite3.Connection, db_lock: QMutex, table: str, page: int,
+                 offset: int, sql: str, params: tuple, batch_size: int = 50, parent=None):
+        """
+        Инициализация потока.
+        
+        Args:
+            conn: Соединение с БД (открыто с check_same_thread=False)
+            db_lock: Мьютекс, которым защищены все обращения к соединению
+            table: Название таблицы
+            page: Номер загружаемой страницы
+            offset: Смещение первой строки страницы
+            sql: Запрос строк страницы
+            params: Параметры запроса
+            batch_size: Размер пачки строк
+            parent: Родительский объект
+        """
+        super().__init__(parent)
+        self.conn = conn
+        self.db_lock = db_lock
+        self.table = table
+        self.page = page
+        self.offset = offset
+        self.sql = sql
+        self.params = params
+        self.batch_size = batch_size
+        self.error: Optional[str] = None
+    
+    def run(self):
+        """Выполнить запрос и передать строки пачками."""
+        try:
+            with QMutexLocker(self.db_lock):
+                cursor = self.conn.cursor()
+                cursor.arraysize = self.batch_size
+                cursor.execute(self.sql, self.params)
+                batch = cursor.fetchmany()
+                while batch:
+                    self.rows_ready.emit(batch)
+                    batch = cursor.fetchmany()
+        except Exception as e:
+            self.error = str(e)
+
+
+class RowCountThread(QThread):
+    """
+    Поток подсчета строк таблицы. COUNT(*) проходит всю таблицу, поэтому
+    выполняется через отдельное соединение только для чтения: общее соединение
+    (и его мьютекс) остается свободным для загрузки страниц и GUI-потока.
+    """
+    
+    counted = pyqtSignal(int)  # Точное число строк таблицы
+    
+    def __init__(self, db_uri: str, table: str, sql: str, parent=None):
+        """
+        Инициализация потока.
+        
+        Args:
+            db_uri: URI файла БД для соединения только для чтения
+            table: Название таблицы
+            sql: Запрос числа строк
+            parent: Родительский объект
+        """
+        super().__init__(parent)
+        self.db_uri = db_uri
+        self.table = table
+        self.sql = sql
+        self.error: Optional[str] = None
+        self._cancelled = False
+    
+    def run(self):
+        """Подсчитать строки таблицы."""
+        try:
+            conn = sqlite3.connect(self.db_uri, uri=True)
+            try:
+                # Обработчик прогресса прерывает запрос после вызова cancel
+                conn.set_progress_handler(lambda: self._cancelled, 10000)
+                count = conn.execute(self.sql).fetchone()[0]
+            finally:
+                conn.close()
+            self.counted.emit(count)
+        except Exception as e:
+            self.error = str(e)
+    
+    def cancel(self):
+        """Прервать подсчет (результат больше не нужен)."""
+        self._cancelled = True
 
 
 class DatabaseViewer(QMainWindow):
@@ -21,11 +323,36 @@ class DatabaseViewer(QMainWindow):
     def __init__(self):
         super().__init__()
         self.db_path = None
+        # Соединение только для чтения (просмотр); соединение для записи
+        # открывается при первом изменении данных (см. _rw)
         self.conn = None
+        self._rw_conn: Optional[sqlite3.Connection] = None
+        # Соединение используется из GUI-потока и потока загрузки страниц
+        self._db_lock = QMutex()
+        # Идущие загрузка страницы и подсчет строк (None после обработки завершения;
+        # сами потоки удаляются через deleteLater)
+        self._page_thread: Optional[PageLoadThread] = None
+        self._count_thread: Optional[RowCountThread] = None
+        # Смещение первой строки загруженной страницы (None - страница не загружена)
+        self._shown_offset: Optional[int] = None
+        self._reload_pending = False
+        self._fit_columns = False
+        # Запросы открытой таблицы (см. build_table_sql)
+        self._table_sql: Dict[str, str] = {}
         self.current_table = None
         self.current_page = 1
         self.page_size = 50
         self.total_rows = 0
+        # Постраничный переход по rowid: номер страницы -> rowid, после которого
+        # она начинается (None - с начала таблицы)
+        self._has_rowid = False
+        self._page_cursors: Dict[int, Optional[int]] = {1: None}
+        # Номер показанной страницы и rowid ее первой строки
+        self._shown_page: Optional[Tuple[int, int]] = None
+        # Число строк по таблицам открытой БД (COUNT(*) - полный проход по таблице)
+        self._row_count_cache: Dict[str, int] = {}
+        # Структура таблиц открытой БД (см. read_table_schema)
+        self._schema_cache: Dict[str, Dict[str, Any]] = {}
         
         self.setWindowTitle("SQLite Database Viewer")
         self.setGeometry(100, 100, 1200, 800)
@@ -55,16 +382,19 @@ class DatabaseViewer(QMainWindow):
         layout.addWidget(file_panel)
         
         # Список таблиц
-        tables_group = QGroupBox("Таблицы базы данных")
+        tables_group = QGroupBox("Таблицы базы данных (двойной щелчок или Enter - открыть)")
         tables_layout = QVBoxLayout()
         tables_group.setLayout(tables_layout)
         
         self.tables_list = QTableWidget()
-        self.tables_list.setColumnCount(2)
-        self.tables_list.setHorizontalHeaderLabels(["Название таблицы", "Действия"])
+        self.tables_list.setColumnCount(1)
+        self.tables_list.setHorizontalHeaderLabels(["Название таблицы"])
         self.tables_list.horizontalHeader().setSectionResizeMode(0, QHeaderView.Stretch)
-        self.tables_list.horizontalHeader().setSectionResizeMode(1, QHeaderView.ResizeToContents)
         self.tables_list.setSelectionBehavior(QTableWidget.SelectRows)
+        # Одно подключение на весь список вместо кнопки в каждой строке
+        self.tables_list.itemActivated.connect(
+            lambda item: self.open_table(item.text())
+        )
         tables_layout.addWidget(self.tables_list)
         
         layout.addWidget(tables_group)
@@ -93,7 +423,12 @@ class DatabaseViewer(QMainWindow):
         self.page_spin = QSpinBox()
         self.page_spin.setMinimum(1)
         self.page_spin.setMaximum(1)
-        self.page_spin.valueChanged.connect(self.go_to_page)
+        # Переход выполняется после паузы во вводе номера страницы
+        self._page_timer = QTimer(self)
+        self._page_timer.setSingleShot(True)
+        self._page_timer.setInterval(PAGE_INPUT_DELAY_MS)
+        self._page_timer.timeout.connect(lambda: self.go_to_page(self.page_spin.value()))
+        self.page_spin.valueChanged.connect(lambda: self._page_timer.start())
         pagination_layout.addWidget(self.page_spin)
         
         page_size_label = QLabel("из")
@@ -112,10 +447,15 @@ class DatabaseViewer(QMainWindow):
         data_layout.addLayout(info_layout)
         
         # Таблица данных
-        self.data_table = QTableWidget()
+        self.rows_model = RowsModel(self)
+        self.data_table = QTableView()
+        self.data_table.setModel(self.rows_model)
         self.data_table.setAlternatingRowColors(True)
-        self.data_table.setSelectionBehavior(QTableWidget.SelectRows)
-        self.data_table.setEditTriggers(QTableWidget.NoEditTriggers)  # Редактирование через диалог
+        self.data_table.setSelectionBehavior(QTableView.SelectRows)
+        self.data_table.setEditTriggers(QTableView.NoEditTriggers)  # Редактирование через диалог
+        # Ширина колонок подгоняется по содержимому только при открытии таблицы
+        # или по кнопке, а не при каждой смене страницы
+        self.data_table.horizontalHeader().setDefaultSectionSize(150)
         data_layout.addWidget(self.data_table)
         
         # Кнопки CRUD
@@ -141,6 +481,14 @@ class DatabaseViewer(QMainWindow):
         refresh_button.clicked.connect(self.refresh_table)
         crud_layout.addWidget(refresh_button)
         
+        fit_button = QPushButton("↔ Подогнать колонки")
+        fit_button.clicked.connect(self.data_table.resizeColumnsToContents)
+        crud_layout.addWidget(fit_button)
+        
+        export_button = QPushButton("💾 Экспорт CSV")
+        export_button.clicked.connect(self.export_csv)
+        crud_layout.addWidget(export_button)
+        
         crud_layout.addStretch()
         
         data_layout.addLayout(crud_layout)
@@ -158,12 +506,15 @@ class DatabaseViewer(QMainWindow):
         
         if file_path:
             try:
-                if self.conn:
-                    self.conn.close()
+                self._close_connections()
                 
                 self.db_path = file_path
-                self.conn = sqlite3.connect(file_path)
+                self._row_count_cache.clear()
+                self._schema_cache.clear()
+                self.conn = sqlite3.connect(self._ro_uri(), uri=True,
+                                            check_same_thread=False, cached_statements=128)
                 self.conn.row_factory = sqlite3.Row
+                apply_connection_pragmas(self.conn)
                 
                 self.file_label.setText(f"Файл: {file_path}")
                 self.load_tables()
@@ -172,34 +523,60 @@ class DatabaseViewer(QMainWindow):
             except Exception as e:
                 QMessageBox.critical(self, "Ошибка", f"Не удалось открыть базу данных:\n{str(e)}")
     
+    def _ro_uri(self) -> str:
+        """URI открытой БД для соединения только для чтения."""
+        return f"{Path(self.db_path).resolve().as_uri()}?mode=ro"
+    
+    def _rw(self) -> sqlite3.Connection:
+        """
+        Получить соединение для записи, открыв его при первом изменении данных.
+        
+        Returns:
+            Соединение с БД в режиме чтения и записи
+        """
+        if self._rw_conn is None:
+            self._rw_conn = sqlite3.connect(self.db_path, cached_statements=128)
+            apply_connection_pragmas(self._rw_conn)
+        return self._rw_conn
+    
+    def _close_connections(self):
+        """Закрыть соединения с БД, дождавшись загрузки страницы."""
+        self._cancel_count()
+        if self.conn:
+            self._wait_page_thread()
+            self.conn.close()
+            self.conn = None
+        if self._rw_conn is not None:
+            self._rw_conn.close()
+            self._rw_conn = None
+    
     def load_tables(self):
         """Загрузить список таблиц."""
         if not self.conn:
             return
         
         try:
-            cursor = self.conn.cursor()
-            cursor.execute("""
-                SELECT name FROM sqlite_master 
-                WHERE type='table' AND name NOT LIKE 'sqlite_%'
-                ORDER BY name
-            """)
-            tables = cursor.fetchall()
-            
-            self.tables_list.setRowCount(len(tables))
+            with QMutexLocker(self._db_lock):
+                cursor = self.conn.cursor()
+                cursor.execute("""
+                    SELECT name FROM sqlite_master 
+                    WHERE type='table' AND name NOT LIKE 'sqlite_%'
+                    ORDER BY name
+                """)
+                tables = cursor.fetchall()
             
-            for row, (table_name,) in enumerate(tables):
-                # Название таблицы
-                name_item = QTableWidgetItem(table_name)
-                name_item.setFlags(name_item.flags() & ~Qt.ItemIsEditable)
-                self.tables_list.setItem(row, 0, name_item)
+            # Перерисовка отключается на время заполнения, список обновляется один раз
+            self.tables_list.setUpdatesEnabled(False)
+            try:
+                self.tables_list.setRowCount(len(tables))
                 
-                # Кнопка "Открыть"
-                open_button = QPushButton("Открыть")
-                open_button.clicked.connect(
-                    lambda checked, t=table_name: self.open_table(t)
-                )
-                self.tables_list.setCellWidget(row, 1, open_button)
+                for row, (table_name,) in enumerate(tables):
+                    # Название таблицы
+                    name_item = QTableWidgetItem(table_name)
+                    name_item.setFlags(name_item.flags() & ~Qt.ItemIsEditable)
+                    self.tables_list.setItem(row, 0, name_item)
+            finally:
+                self.tables_list.setUpdatesEnabled(True)
         except Exception as e:
             QMessageBox.critical(self, "Ошибка", f"Ошибка при загрузке таблиц:\n{str(e)}")
     
@@ -207,68 +584,240 @@ class DatabaseViewer(QMainWindow):
         """Открыть таблицу для просмотра."""
         self.current_table = table_name
         self.current_page = 1
+        self._table_sql = build_table_sql(table_name)
+        self._has_rowid = self._table_has_rowid(table_name)
+        self._reset_page_cursors()
+        self._shown_page = None
+        self._cancel_count()
+        self._row_count_cache.pop(table_name, None)
+        self._schema_cache.pop(table_name, None)
+        # Подгонка ширины колонок проходит по всем ячейкам, поэтому только при открытии
+        self._fit_columns = True
         self.load_table_data()
     
     def load_table_data(self):
-        """Загрузить данные таблицы с пагинацией."""
+        """Загрузить данные таблицы с пагинацией (запросы выполняются в фоновом потоке)."""
         if not self.conn or not self.current_table:
             return
         
+        if self._page_thread is not None:
+            # Страница будет загружена заново с актуальными параметрами
+            self._reload_pending = True
+            return
+        
+        table = self.current_table
         try:
-            cursor = self.conn.cursor()
-            
             # Получаем структуру таблицы
-            cursor.execute(f"PRAGMA table_info({self.current_table})")
-            columns_info = cursor.fetchall()
-            column_names = [col[1] for col in columns_info]
-            
-            # Подсчитываем общее количество строк
-            cursor.execute(f"SELECT COUNT(*) FROM {self.current_table}")
-            self.total_rows = cursor.fetchone()[0]
-            
-            # Вычисляем пагинацию
-            total_pages = max(1, (self.total_rows + self.page_size - 1) // self.page_size)
-            self.page_spin.setMaximum(total_pages)
-            self.total_pages_label.setText(str(total_pages))
-            self.page_spin.setValue(self.current_page)
-            
-            # Загружаем данные для текущей страницы
-            offset = (self.current_page - 1) * self.page_size
-            cursor.execute(f"SELECT * FROM {self.current_table} LIMIT ? OFFSET ?", 
-                          (self.page_size, offset))
-            rows = cursor.fetchall()
-            
-            # Настраиваем таблицу
-            self.data_table.setColumnCount(len(column_names))
-            self.data_table.setHorizontalHeaderLabels(column_names)
-            self.data_table.setRowCount(len(rows))
-            
-            # Заполняем данные
-            for row_idx, row in enumerate(rows):
-                for col_idx, value in enumerate(row):
-                    item = QTableWidgetItem(str(value) if value is not None else "NULL")
-                    item.setFlags(item.flags() & ~Qt.ItemIsEditable)
-                    # Сохраняем исходное значение для редактирования
-                    item.setData(Qt.UserRole, value)
-                    self.data_table.setItem(row_idx, col_idx, item)
-            
-            # Автоматически подгоняем ширину колонок
+            column_names = self.table_schema(table)["columns"]
+        except Exception as e:
+            QMessageBox.critical(self, "Ошибка", f"Ошибка при загрузке данных:\n{str(e)}")
+            return
+        
+        # Подсчитываем общее количество строк (один раз до изменения данных)
+        total_rows = self._row_count_cache.get(table)
+        if total_rows is None:
+            if self._has_rowid:
+                # До окончания COUNT(*) число страниц оценивается сверху по max(rowid)
+                try:
+                    with QMutexLocker(self._db_lock):
+                        estimate = self.conn.execute(self._table_sql["max_rowid"]).fetchone()[0]
+                    self._set_total_rows(max(estimate or 0, 0))
+                except sqlite3.Error:
+                    pass
+        else:
+            self._set_total_rows(total_rows)
+        
+        # Загружаем данные для текущей страницы
+        offset = (self.current_page - 1) * self.page_size
+        sql, params = self._page_query(offset)
+        
+        # Строки передаются в модель пачками по мере чтения из курсора
+        self.rows_model.set_rows(column_names, [])
+        self._shown_offset = None
+        thread = PageLoadThread(
+            self.conn, self._db_lock, table, self.current_page, offset,
+            sql, params, self.page_size, self
+        )
+        thread.rows_ready.connect(self.rows_model.append_rows)
+        thread.finished.connect(self.on_page_loaded)
+        thread.finished.connect(thread.deleteLater)
+        self._page_thread = thread
+        thread.start()
+        
+        # Строки считаются параллельно со страницей и не задерживают ее загрузку
+        if total_rows is None and self._count_thread is None:
+            count_thread = RowCountThread(self._ro_uri(), table, self._table_sql["count"], self)
+            count_thread.counted.connect(self.on_rows_counted)
+            count_thread.finished.connect(self.on_count_finished)
+            count_thread.finished.connect(count_thread.deleteLater)
+            self._count_thread = count_thread
+            count_thread.start()
+    
+    def on_rows_counted(self, total_rows: int):
+        """Обработать подсчитанное в потоке число строк таблицы."""
+        thread = self.sender()
+        if thread is not self._count_thread:
+            # Подсчет был отменен (таблица открыта заново или данные изменились)
+            return
+        self._row_count_cache[thread.table] = total_rows
+        if thread.table == self.current_table:
+            self._set_total_rows(total_rows)
+            self._update_table_info()
+    
+    def on_page_loaded(self):
+        """Обработать завершение загрузки страницы."""
+        thread = self._page_thread
+        thread.wait()
+        # Поток удаляется через deleteLater после этого обработчика
+        self._page_thread = None
+        
+        if thread.error is None and thread.table == self.current_table:
+            self._shown_offset = thread.offset
+            self._remember_page(thread.page)
+        
+        if self._reload_pending:
+            self._reload_pending = False
+            self.load_table_data()
+            return
+        
+        if thread.error is not None:
+            QMessageBox.critical(self, "Ошибка", f"Ошибка при загрузке данных:\n{thread.error}")
+            return
+        
+        if self._fit_columns:
+            self._fit_columns = False
             self.data_table.resizeColumnsToContents()
+        
+        self._update_table_info()
+    
+    def _update_table_info(self):
+        """Обновить подписи с числом записей и номером страницы."""
+        if self._page_thread is not None or self._shown_offset is None:
+            # Подписи обновятся после загрузки страницы
+            return
+        total_pages = max(1, (self.total_rows + self.page_size - 1) // self.page_size)
+        start_row = self._shown_offset + 1
+        end_row = min(self._shown_offset + self.rows_model.rowCount(), self.total_rows)
+        self.table_info_label.setText(
+            f"Таблица: {self.current_table} | "
+            f"Всего записей: {self.total_rows} | "
+            f"Показано: {start_row}-{end_row}"
+        )
+        self.page_info_label.setText(
+            f"Страница {self.current_page} из {total_pages}"
+        )
+    
+    def _set_total_rows(self, total_rows: int):
+        """Обновить число строк и элементы пагинации."""
+        self.total_rows = total_rows
+        
+        # Вычисляем пагинацию
+        total_pages = max(1, (self.total_rows + self.page_size - 1) // self.page_size)
+        # Программное изменение номера страницы не должно запускать загрузку
+        self.page_spin.blockSignals(True)
+        self.page_spin.setMaximum(total_pages)
+        self.page_spin.setValue(self.current_page)
+        self.page_spin.blockSignals(False)
+        self.total_pages_label.setText(str(total_pages))
+    
+    def on_count_finished(self):
+        """Сообщить об ошибке подсчета строк (отмененный подсчет не сообщает)."""
+        thread = self.sender()
+        if thread is not self._count_thread:
+            return
+        # Поток удаляется через deleteLater после этого обработчика
+        self._count_thread = None
+        if thread.error is not None:
+            QMessageBox.critical(self, "Ошибка", f"Ошибка при подсчете записей:\n{thread.error}")
+    
+    def _cancel_count(self):
+        """Отменить идущий подсчет строк: его результат устарел."""
+        if self._count_thread is not None:
+            self._count_thread.cancel()
+            self._count_thread.wait()
+            self._count_thread = None
+    
+    def _wait_page_thread(self):
+        """Дождаться завершения загрузки страницы перед закрытием соединения."""
+        if self._page_thread is not None:
+            self._page_thread.wait()
+    
+    def table_schema(self, table_name: str) -> Dict[str, Any]:
+        """
+        Получить структуру таблицы из кэша, прочитав ее при первом обращении.
+        
+        Args:
+            table_name: Название таблицы
             
-            # Обновляем информацию
-            start_row = offset + 1
-            end_row = min(offset + len(rows), self.total_rows)
-            self.table_info_label.setText(
-                f"Таблица: {self.current_table} | "
-                f"Всего записей: {self.total_rows} | "
-                f"Показано: {start_row}-{end_row}"
-            )
-            self.page_info_label.setText(
-                f"Страница {self.current_page} из {total_pages}"
-            )
+        Returns:
+            Словарь со структурой таблицы (см. read_table_schema)
+        """
+        schema = self._schema_cache.get(table_name)
+        if schema is None:
+            with QMutexLocker(self._db_lock):
+                schema = read_table_schema(self.conn, table_name)
+            self._schema_cache[table_name] = schema
+        return schema
+    
+    def _table_has_rowid(self, table_name: str) -> bool:
+        """Проверить, есть ли у таблицы rowid (его нет у таблиц WITHOUT ROWID)."""
+        try:
+            with QMutexLocker(self._db_lock):
+                self.conn.execute(f"SELECT rowid FROM {_q(table_name)} LIMIT 0")
+            return True
+        except sqlite3.OperationalError:
+            return False
+    
+    def _reset_page_cursors(self):
+        """Забыть границы посещенных страниц (после изменения данных)."""
+        self._page_cursors = {1: None}
+    
+    def _page_query(self, offset: int) -> Tuple[str, tuple]:
+        """
+        Составить запрос строк текущей страницы.
+        
+        Для таблиц с rowid страница выбирается по ключу (WHERE rowid > ?), поэтому
+        SQLite не перебирает offset пропущенных строк. OFFSET используется только
+        при переходе на страницу, граница которой еще неизвестна. При выборке
+        по rowid он добавляется последней колонкой.
+        
+        Args:
+            offset: Смещение первой строки страницы
             
-        except Exception as e:
-            QMessageBox.critical(self, "Ошибка", f"Ошибка при загрузке данных:\n{str(e)}")
+        Returns:
+            Текст запроса и его параметры
+        """
+        sql = self._table_sql
+        page = self.current_page
+        
+        if not self._has_rowid:
+            return sql["page_offset"], (self.page_size, offset)
+        
+        shown = self._shown_page
+        if shown is not None and shown[0] == page:
+            # Повторная загрузка той же страницы
+            return sql["rowid_from"], (shown[1], self.page_size)
+        if page in self._page_cursors:
+            after = self._page_cursors[page]
+            if after is None:
+                return sql["rowid_first"], (self.page_size,)
+            return sql["rowid_after"], (after, self.page_size)
+        if shown is not None and shown[0] == page + 1:
+            # Предыдущая страница: выбираем в обратном порядке от первой строки
+            # текущей и возвращаем в прямом
+            return sql["rowid_before"], (shown[1], self.page_size)
+        return sql["rowid_offset"], (self.page_size, offset)
+    
+    def _remember_page(self, page: int):
+        """Запомнить границы показанной страницы по rowid ее первой и последней строк."""
+        if not self._has_rowid:
+            return
+        count = self.rows_model.rowCount()
+        if count:
+            self._shown_page = (page, self.rows_model.record(0)[-1])
+            self._page_cursors[page + 1] = self.rows_model.record(count - 1)[-1]
+        else:
+            self._shown_page = None
     
     def prev_page(self):
         """Перейти на предыдущую страницу."""
@@ -285,12 +834,64 @@ class DatabaseViewer(QMainWindow):
     
     def go_to_page(self, page: int):
         """Перейти на указанную страницу."""
+        if page == self.current_page:
+            return
         self.current_page = page
         self.load_table_data()
     
+    def iter_table(self, table_name: str, batch: int = ITER_BATCH_SIZE) -> Iterator[sqlite3.Row]:
+        """
+        Перебрать все строки таблицы, читая их из курсора пачками.
+        Память не зависит от размера таблицы. Вызывающий код должен удерживать
+        self._db_lock, пока перебирает строки.
+        
+        Args:
+            table_name: Название таблицы
+            batch: Размер пачки строк
+            
+        Yields:
+            Строки таблицы
+        """
+        cursor = self.conn.cursor()
+        cursor.arraysize = batch
+        cursor.execute(f"SELECT * FROM {_q(table_name)}")
+        rows = cursor.fetchmany()
+        while rows:
+            yield from rows
+            rows = cursor.fetchmany()
+    
+    def export_csv(self):
+        """Экспортировать текущую таблицу в CSV-файл."""
+        if not self.current_table:
+            QMessageBox.warning(self, "Ошибка", "Выберите таблицу!")
+            return
+        
+        file_path, _ = QFileDialog.getSaveFileName(
+            self,
+            "Экспорт таблицы в CSV",
+            f"{self.current_table}.csv",
+            "CSV (*.csv);;All Files (*)"
+        )
+        if not file_path:
+            return
+        
+        try:
+            columns = self.table_schema(self.current_table)["columns"]
+            with open(file_path, "w", newline="", encoding="utf-8") as f:
+                writer = csv.writer(f)
+                writer.writerow(columns)
+                with QMutexLocker(self._db_lock):
+                    writer.writerows(self.iter_table(self.current_table))
+            QMessageBox.information(self, "Успех", "Таблица успешно экспортирована!")
+        except Exception as e:
+            QMessageBox.critical(self, "Ошибка", f"Ошибка при экспорте:\n{str(e)}")
+    
     def refresh_table(self):
         """Обновить данные таблицы."""
         if self.current_table:
+            self._reset_page_cursors()
+            self._cancel_count()
+            self._row_count_cache.pop(self.current_table, None)
             self.load_table_data()
     
     def get_selected_row_data(self) -> Optional[Dict[str, Any]]:
@@ -300,15 +901,7 @@ class DatabaseViewer(QMainWindow):
             QMessageBox.warning(self, "Ошибка", "Выберите строку для редактирования!")
             return None
         
-        row = selected_rows[0].row()
-        data = {}
-        for col in range(self.data_table.columnCount()):
-            header = self.data_table.horizontalHeaderItem(col).text()
-            item = self.data_table.item(row, col)
-            if item:
-                data[header] = item.data(Qt.UserRole)
-        
-        return data
+        return self.rows_model.row_values(selected_rows[0].row())
     
     def create_record(self):
         """Создать новую запись."""
@@ -316,7 +909,14 @@ class DatabaseViewer(QMainWindow):
             QMessageBox.warning(self, "Ошибка", "Выберите таблицу!")
             return
         
-        dialog = RecordEditDialog(self, self.conn, self.current_table, None)
+        try:
+            conn = self._rw()
+        except sqlite3.Error as e:
+            QMessageBox.critical(self, "Ошибка", f"Не удалось открыть базу данных для записи:\n{str(e)}")
+            return
+        
+        dialog = RecordEditDialog(self, conn, self.current_table, None,
+                                  self.table_schema(self.current_table), self._db_lock)
         if dialog.exec_() == QDialog.Accepted:
             self.refresh_table()
     
@@ -339,7 +939,14 @@ class DatabaseViewer(QMainWindow):
         if not row_data:
             return
         
-        dialog = RecordEditDialog(self, self.conn, self.current_table, row_data)
+        try:
+            conn = self._rw()
+        except sqlite3.Error as e:
+            QMessageBox.critical(self, "Ошибка", f"Не удалось открыть базу данных для записи:\n{str(e)}")
+            return
+        
+        dialog = RecordEditDialog(self, conn, self.current_table, row_data,
+                                  self.table_schema(self.current_table), self._db_lock)
         if dialog.exec_() == QDialog.Accepted:
             self.refresh_table()
     
@@ -363,24 +970,18 @@ class DatabaseViewer(QMainWindow):
         
         if reply == QMessageBox.Yes:
             try:
-                cursor = self.conn.cursor()
-                
                 # Получаем PRIMARY KEY
-                cursor.execute(f"PRAGMA table_info({self.current_table})")
-                columns_info = cursor.fetchall()
-                pk_column = None
-                for col in columns_info:
-                    if col[5]:  # pk flag
-                        pk_column = col[1]
-                        break
+                pk_column = self.table_schema(self.current_table)["pk"]
                 
                 if not pk_column:
                     QMessageBox.warning(self, "Ошибка", "Не найден PRIMARY KEY для удаления!")
                     return
                 
                 pk_value = row_data[pk_column]
-                cursor.execute(f"DELETE FROM {self.current_table} WHERE {pk_column} = ?", (pk_value,))
-                self.conn.commit()
+                conn = self._rw()
+                with QMutexLocker(self._db_lock), immediate_transaction(conn):
+                    conn.execute(f"DELETE FROM {_q(self.current_table)} WHERE {_q(pk_column)} = ?",
+                                      (pk_value,))
                 
                 QMessageBox.information(self, "Успех", "Запись успешно удалена!")
                 self.refresh_table()
@@ -389,8 +990,7 @@ class DatabaseViewer(QMainWindow):
     
     def closeEvent(self, event):
         """Закрытие приложения."""
-        if self.conn:
-            self.conn.close()
+        self._close_connections()
         event.accept()
 
 
@@ -428,36 +1028,38 @@ class RecordEditDialog(QDialog):
     """Диалог для создания/редактирования записи."""
     
     def __init__(self, parent, conn: sqlite3.Connection, table_name: str, 
-                 row_data: Optional[Dict[str, Any]] = None):
+                 row_data: Optional[Dict[str, Any]] = None,
+                 schema: Optional[Dict[str, Any]] = None,
+                 db_lock: Optional[QMutex] = None):
         super().__init__(parent)
         self.conn = conn
+        # Мьютекс соединения, общий с окном просмотра
+        self.db_lock = db_lock if db_lock is not None else QMutex()
         self.table_name = table_name
         self.row_data = row_data
+        # Структура таблицы из кэша окна; без нее читается заново
+        self.schema = schema if schema is not None else read_table_schema(conn, table_name)
         self.is_edit = row_data is not None
         
         self.setWindowTitle("Редактировать запись" if self.is_edit else "Создать запись")
         self.setMinimumWidth(500)
         
         self.init_ui()
+        self._build_sql()
     
     def init_ui(self):
         """Инициализация интерфейса."""
         layout = QVBoxLayout()
         self.setLayout(layout)
         
-        # Получаем структуру таблицы
-        cursor = self.conn.cursor()
-        cursor.execute(f"PRAGMA table_info({self.table_name})")
-        columns_info = cursor.fetchall()
+        schema = self.schema
         
         self.fields = {}
         form_layout = QFormLayout()
         
-        for col in columns_info:
-            col_name = col[1]
-            col_type = col[2]
-            is_pk = col[5]  # PRIMARY KEY flag
-            is_not_null = col[3]  # NOT NULL flag
+        for col_name in schema["columns"]:
+            is_pk = col_name in schema["pk_columns"]
+            is_not_null = col_name in schema["not_null"]
             
             # Пропускаем PRIMARY KEY при редактировании
             if self.is_edit and is_pk:
@@ -468,15 +1070,13 @@ class RecordEditDialog(QDialog):
                 label_text += " *"
             
             # Создаем поле ввода
-            if "TEXT" in col_type.upper():
-                field = QTextEdit()
+            field = schema["widget_factory"][col_name]()
+            if isinstance(field, QTextEdit):
                 field.setMaximumHeight(100)
                 if self.is_edit and col_name in self.row_data:
                     field.setPlainText(str(self.row_data[col_name]) if self.row_data[col_name] is not None else "")
-            else:
-                field = QLineEdit()
-                if self.is_edit and col_name in self.row_data:
-                    field.setText(str(self.row_data[col_name]) if self.row_data[col_name] is not None else "")
+            elif self.is_edit and col_name in self.row_data:
+                field.setText(str(self.row_data[col_name]) if self.row_data[col_name] is not None else "")
             
             form_layout.addRow(label_text, field)
             self.fields[col_name] = (field, is_pk, is_not_null)
@@ -497,72 +1097,64 @@ class RecordEditDialog(QDialog):
         
         layout.addLayout(button_layout)
     
+    def _build_sql(self):
+        """Составить запросы INSERT и UPDATE по колонкам формы (один раз на диалог)."""
+        table = _q(self.table_name)
+        columns = [_q(col_name) for col_name in self.fields]
+        self._insert_sql = (
+            f"INSERT INTO {table} ({', '.join(columns)}) "
+            f"VALUES ({', '.join('?' * len(columns))})"
+        )
+        pk_column = self.schema["pk"]
+        self._update_sql = None
+        if pk_column:
+            set_clauses = ", ".join(f"{column} = ?" for column in columns)
+            self._update_sql = f"UPDATE {table} SET {set_clauses} WHERE {_q(pk_column)} = ?"
+    
+    def commit_rows(self, rows: Iterable[Sequence[Any]]) -> int:
+        """
+        Вставить несколько записей одним executemany и одним коммитом.
+        
+        Args:
+            rows: Значения записей в порядке колонок формы (self.fields)
+            
+        Returns:
+            Число вставленных записей
+        """
+        with QMutexLocker(self.db_lock), immediate_transaction(self.conn):
+            cursor = self.conn.executemany(self._insert_sql, rows)
+        return cursor.rowcount
+    
     def save_record(self):
         """Сохранить запись."""
         try:
-            cursor = self.conn.cursor()
+            if self.is_edit and self._update_sql is None:
+                QMessageBox.warning(self, "Ошибка", "Не найден PRIMARY KEY!")
+                return
             
-            if self.is_edit:
-                # Обновление существующей записи
-                pk_column = None
-                for col_name, (field, is_pk, _) in self.fields.items():
-                    if is_pk:
-                        pk_column = col_name
-                        break
-                
-                if not pk_column:
-                    # Ищем PK в исходных данных
-                    cursor.execute(f"PRAGMA table_info({self.table_name})")
-                    columns_info = cursor.fetchall()
-                    for col in columns_info:
-                        if col[5]:  # pk flag
-                            pk_column = col[1]
-                            break
+            values = []
+            for col_name, (field, is_pk, is_not_null) in self.fields.items():
+                if isinstance(field, QTextEdit):
+                    value = field.toPlainText()
+                else:
+                    value = field.text()
                 
-                if not pk_column:
-                    QMessageBox.warning(self, "Ошибка", "Не найден PRIMARY KEY!")
+                if not self.is_edit and is_not_null and not value:
+                    QMessageBox.warning(self, "Ошибка", f"Поле '{col_name}' обязательно для заполнения!")
                     return
                 
-                pk_value = self.row_data[pk_column]
-                set_clauses = []
-                values = []
-                
-                for col_name, (field, is_pk, _) in self.fields.items():
-                    if not is_pk:
-                        if isinstance(field, QTextEdit):
-                            value = field.toPlainText()
-                        else:
-                            value = field.text()
-                        set_clauses.append(f"{col_name} = ?")
-                        values.append(value if value else None)
-                
-                values.append(pk_value)
-                query = f"UPDATE {self.table_name} SET {', '.join(set_clauses)} WHERE {pk_column} = ?"
-                cursor.execute(query, values)
+                values.append(value if value else None)
+            
+            if self.is_edit:
+                # Обновление существующей записи
+                values.append(self.row_data[self.schema["pk"]])
+                query = self._update_sql
             else:
                 # Создание новой записи
-                columns = []
-                values = []
-                placeholders = []
-                
-                for col_name, (field, is_pk, is_not_null) in self.fields.items():
-                    if isinstance(field, QTextEdit):
-                        value = field.toPlainText()
-                    else:
-                        value = field.text()
-                    
-                    if is_not_null and not value:
-                        QMessageBox.warning(self, "Ошибка", f"Поле '{col_name}' обязательно для заполнения!")
-                        return
-                    
-                    columns.append(col_name)
-                    placeholders.append("?")
-                    values.append(value if value else None)
-                
-                query = f"INSERT INTO {self.table_name} ({', '.join(columns)}) VALUES ({', '.join(placeholders)})"
-                cursor.execute(query, values)
+                query = self._insert_sql
             
-            self.conn.commit()
+            with QMutexLocker(self.db_lock), immediate_transaction(self.conn):
+                self.conn.execute(query, values)
             QMessageBox.information(self, "Успех", "Запись успешно сохранена!")
             self.accept()
         except Exception as e:
@@ -3,14 +3,201 @@
 Позволяет просматривать, фильтровать и удалять сохраненные результаты.
 """
 from PyQt5.QtWidgets import (
-    QDialog, QVBoxLayout, QHBoxLayout, QPushButton, QTableWidget,
-    QTableWidgetItem, QHeaderView, QMessageBox, QLineEdit, QLabel,
-    QComboBox, QWidget, QTextEdit
+    QDialog, QVBoxLayout, QHBoxLayout, QPushButton, QTableView,
+    QHeaderView, QMessageBox, QLineEdit, QLabel,
+    QComboBox, QWidget, QTextEdit, QProgressBar
+)
+from PyQt5.QtCore import (
+    Qt, QAbstractTableModel, QModelIndex, QSignalBlocker, QThread, QTimer, pyqtSignal
 )
-from PyQt5.QtCore import Qt, QDate
 from PyQt5.QtGui import QFont
-from datetime import datetime
+from typing import Dict, List, Optional
 from db import Database
+from widgets import DeleteButtonDelegate, format_table_date
+
+# Колонки таблицы результатов
+COLUMN_DATE, COLUMN_PROMPT, COLUMN_MODEL, COLUMN_RESPONSE, COLUMN_ACTIONS = range(5)
+
+# Задержка поиска после ввода (мс): быстрый набор дает одну фильтрацию
+SEARCH_DELAY_MS = 150
+
+# Сколько строк таблицы результатов показывается за один раз (остальные - при прокрутке)
+FETCH_BATCH_SIZE = 200
+
+# Сколько символов ответа показывается в ячейке (полный текст - по двойному клику)
+RESPONSE_PREVIEW_LENGTH = 200
+
+
+def prepare_results(results: List[Dict], prompts: Dict[int, Dict], models: Dict[int, Dict]):
+    """
+    Один раз вычислить отображаемые поля результатов (дата, промт, модель, ответ),
+    чтобы не повторять это при каждой фильтрации и отрисовке.
+    
+    Args:
+        results: Список словарей результатов (дополняется на месте)
+        prompts: Промты по ID
+        models: Модели по ID
+    """
+    for result in results:
+        result['_date_display'] = format_table_date(result['created_at'])
+        prompt = prompts.get(result['prompt_id'])
+        if prompt is None:
+            result['_prompt_display'] = "N/A"
+        else:
+            text = prompt['prompt']
+            result['_prompt_display'] = text[:80] + "..." if len(text) > 80 else text
+        model = models.get(result['model_id'])
+        result['_model_name'] = model['name'] if model is not None else "Unknown"
+        # Длинный ответ обрезается: ячейке не нужно раскладывать весь текст при отрисовке
+        response = result['response']
+        if len(response) > RESPONSE_PREVIEW_LENGTH:
+            response = response[:RESPONSE_PREVIEW_LENGTH] + "..."
+        result['_response_display'] = response
+
+
+class ResultsTableModel(QAbstractTableModel):
+    """Модель таблицы результатов: строки - словари результатов, виджеты на строки не создаются."""
+    
+    HEADERS = ["Дата", "Промт", "Модель", "Ответ", "Действия"]
+    
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        # Подходящие под фильтр результаты в порядке текущей сортировки
+        self._source: List[Dict] = []
+        # Строки, уже переданные представлению (начало _source, см. fetchMore)
+        self._rows: List[Dict] = []
+        # Текущая сортировка (колонка, порядок), применяется и к новым данным
+        self._sort_column = COLUMN_DATE
+        self._sort_order = Qt.DescendingOrder
+    
+    def rowCount(self, parent=QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self._rows)
+    
+    def canFetchMore(self, parent=QModelIndex()) -> bool:
+        return not parent.isValid() and len(self._rows) < len(self._source)
+    
+    def fetchMore(self, parent=QModelIndex()):
+        """Показать следующую порцию строк (вызывается представлением при прокрутке)."""
+        if parent.isValid():
+            return
+        start = len(self._rows)
+        batch = self._source[start:start + FETCH_BATCH_SIZE]
+        if not batch:
+            return
+        self.beginInsertRows(QModelIndex(), start, start + len(batch) - 1)
+        self._rows.extend(batch)
+        self.endInsertRows()
+    
+    def columnCount(self, parent=QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self.HEADERS)
+    
+    def headerData(self, section: int, orientation, role=Qt.DisplayRole):
+        if orientation == Qt.Horizontal and role == Qt.DisplayRole:
+            return self.HEADERS[section]
+        return None
+    
+    def flags(self, index: QModelIndex):
+        return Qt.ItemIsEnabled | Qt.ItemIsSelectable
+    
+    def data(self, index: QModelIndex, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        result = self._rows[index.row()]
+        column = index.column()
+        
+        if role == Qt.DisplayRole:
+            if column == COLUMN_DATE:
+                return result['_date_display']
+            if column == COLUMN_PROMPT:
+                return result['_prompt_display']
+            if column == COLUMN_MODEL:
+                return result['_model_name']
+            if column == COLUMN_RESPONSE:
+                return result['_response_display']
+        elif role == Qt.ToolTipRole:
+            if column == COLUMN_RESPONSE:
+                return "Двойной клик для просмотра полного текста"
+            if column == COLUMN_ACTIONS:
+                return "Удалить результат"
+        elif role == Qt.TextAlignmentRole:
+            if column == COLUMN_RESPONSE:
+                return int(Qt.AlignTop | Qt.AlignLeft)
+        elif role == Qt.UserRole:
+            return result['id']
+        return None
+    
+    def sort(self, column: int, order=Qt.AscendingOrder):
+        """Отсортировать строки по колонке (колонка действий не сортируется)."""
+        if column == COLUMN_ACTIONS:
+            return
+        self._sort_column = column
+        self._sort_order = order
+        self.set_results(self._source)
+    
+    def _sort_source(self):
+        """Отсортировать результаты согласно текущей сортировке."""
+        key = {
+            COLUMN_DATE: lambda r: r['created_at'] or '',
+            COLUMN_PROMPT: lambda r: r['_prompt_display'],
+            COLUMN_MODEL: lambda r: r['_model_name'],
+            COLUMN_RESPONSE: lambda r: r['response'] or '',
+        }[self._sort_column]
+        self._source.sort(key=key, reverse=self._sort_order == Qt.DescendingOrder)
+    
+    def set_results(self, results: List[Dict]):
+        """
+        Показать результаты (одно обновление представления).
+        Сразу передается только первая порция строк, остальные - при прокрутке.
+        
+        Args:
+            results: Список словарей результатов
+        """
+        self.beginResetModel()
+        self._source = list(results)
+        self._sort_source()
+        self._rows = self._source[:FETCH_BATCH_SIZE]
+        self.endResetModel()
+    
+    def result_at(self, row: int) -> Dict:
+        """Получить данные результата в строке."""
+        return self._rows[row]
+
+
+class ResultsLoadThread(QThread):
+    """Поток для загрузки результатов, промтов и моделей из БД."""
+    
+    loaded = pyqtSignal(list, list, object, object)  # Результаты, ответы в нижнем регистре, промты, модели
+    failed = pyqtSignal(str)  # Текст ошибки загрузки
+    
+    def __init__(self, db: Database):
+        """
+        Инициализация потока.
+        
+        Args:
+            db: Экземпляр класса Database
+        """
+        super().__init__()
+        self.db = db
+    
+    def run(self):
+        """Загрузка результатов в отдельном потоке."""
+        try:
+            try:
+                results = self.db.get_results(order_by="created_at DESC")
+                # Промты и модели в порядке списков фильтров (из кэша БД, если не менялись)
+                prompts = self.db.get_prompts_cached()
+                models = self.db.get_models_cached()
+            finally:
+                # Соединение с БД создается отдельно для каждого потока
+                self.db.close()
+            
+            prepare_results(results, prompts, models)
+            # Ответы в нижнем регистре для поиска (строятся один раз на загрузку)
+            responses_lower = [r['response'].lower() for r in results]
+        except Exception as e:
+            self.failed.emit(str(e))
+            return
+        self.loaded.emit(results, responses_lower, prompts, models)
 
 
 class ViewResultsDialog(QDialog):
@@ -29,6 +216,21 @@ class ViewResultsDialog(QDialog):
         self.setWindowTitle("Просмотр сохраненных результатов")
         self.setMinimumSize(1000, 700)
         
+        # Отложенное применение поиска при вводе текста
+        self._search_timer = QTimer(self)
+        self._search_timer.setSingleShot(True)
+        self._search_timer.setInterval(SEARCH_DELAY_MS)
+        self._search_timer.timeout.connect(self.apply_filters)
+        
+        # Данные заполняются после загрузки в фоновом потоке
+        self.all_results: List[Dict] = []
+        self._responses_lower: List[str] = []
+        self.prompts_dict: Dict[int, Dict] = {}
+        self.models_dict: Dict[int, Dict] = {}
+        self._filter_lists_loaded = False
+        self._load_thread: Optional[ResultsLoadThread] = None
+        self._reload_pending = False
+        
         self.init_ui()
         self.load_results()
     
@@ -55,7 +257,7 @@ class ViewResultsDialog(QDialog):
         filter_row1.addWidget(search_label)
         self.search_input = QLineEdit()
         self.search_input.setPlaceholderText("Поиск по тексту ответа...")
-        self.search_input.textChanged.connect(self.apply_filters)
+        self.search_input.textChanged.connect(lambda: self._search_timer.start())
         filter_row1.addWidget(self.search_input)
         
         # Фильтр по промту
@@ -86,31 +288,50 @@ class ViewResultsDialog(QDialog):
         
         filter_row2.addStretch()
         
+        # Индикатор загрузки результатов
+        self.load_progress = QProgressBar()
+        self.load_progress.setRange(0, 0)
+        self.load_progress.setMaximumWidth(120)
+        self.load_progress.setFormat("Загрузка...")
+        self.load_progress.setVisible(False)
+        filter_row2.addWidget(self.load_progress)
+        
         filter_layout.addLayout(filter_row2)
         
         layout.addWidget(filter_panel)
         
         # Таблица результатов
-        self.results_table = QTableWidget()
-        self.results_table.setColumnCount(5)
-        self.results_table.setHorizontalHeaderLabels([
-            "Дата", "Промт", "Модель", "Ответ", "Действия"
-        ])
+        self.results_model = ResultsTableModel(self)
+        self.results_table = QTableView()
+        self.results_table.setModel(self.results_model)
+        
+        # Кнопка удаления рисуется делегатом
+        delete_delegate = DeleteButtonDelegate(self.results_table)
+        # Подтверждение удаления показывается после обработки щелчка таблицей
+        delete_delegate.delete_requested.connect(self.delete_result, Qt.QueuedConnection)
+        self.results_table.setItemDelegateForColumn(COLUMN_ACTIONS, delete_delegate)
         
         # Настройка колонок
         header = self.results_table.horizontalHeader()
-        header.setSectionResizeMode(0, QHeaderView.ResizeToContents)  # Дата
-        header.setSectionResizeMode(1, QHeaderView.ResizeToContents)  # Промт
-        header.setSectionResizeMode(2, QHeaderView.ResizeToContents)  # Модель
-        header.setSectionResizeMode(3, QHeaderView.Stretch)  # Ответ
-        header.setSectionResizeMode(4, QHeaderView.ResizeToContents)  # Действия
+        header.setSectionResizeMode(COLUMN_DATE, QHeaderView.ResizeToContents)
+        header.setSectionResizeMode(COLUMN_PROMPT, QHeaderView.ResizeToContents)
+        header.setSectionResizeMode(COLUMN_MODEL, QHeaderView.ResizeToContents)
+        header.setSectionResizeMode(COLUMN_RESPONSE, QHeaderView.Stretch)
+        header.setSectionResizeMode(COLUMN_ACTIONS, QHeaderView.ResizeToContents)
+        # Одинаковая фиксированная высота строк (больше обычной для лучшего
+        # отображения текста): представление не запрашивает размер каждой строки
+        vertical_header = self.results_table.verticalHeader()
+        vertical_header.setSectionResizeMode(QHeaderView.Fixed)
+        vertical_header.setDefaultSectionSize(100)
         
         self.results_table.setAlternatingRowColors(True)
-        self.results_table.setSelectionBehavior(QTableWidget.SelectRows)
+        self.results_table.setSelectionBehavior(QTableView.SelectRows)
+        # Изначально - новые результаты сверху, как их возвращает БД
+        header.setSortIndicator(COLUMN_DATE, Qt.DescendingOrder)
         self.results_table.setSortingEnabled(True)
         self.results_table.setWordWrap(True)  # Перенос текста в ячейках
         # Обработчик двойного клика для просмотра полного ответа
-        self.results_table.itemDoubleClicked.connect(self.view_full_response)
+        self.results_table.doubleClicked.connect(self.view_full_response)
         layout.addWidget(self.results_table)
         
         # Кнопки управления
@@ -131,67 +352,87 @@ class ViewResultsDialog(QDialog):
         buttons_layout.addWidget(close_button)
         
         layout.addLayout(buttons_layout)
-        
-        # Загружаем списки для фильтров
-        self.load_filter_lists()
     
     def load_filter_lists(self):
-        """Загрузить списки промтов и моделей для фильтров."""
-        # Загружаем промты
-        prompts = self.db.get_prompts(order_by="date DESC")
-        for prompt in prompts:
-            date_str = prompt['date'][:10] if prompt['date'] else ""
-            display_text = f"{date_str}: {prompt['prompt'][:50]}..."
-            self.prompt_combo.addItem(display_text, prompt['id'])
-        
-        # Загружаем модели
-        models = self.db.get_models(order_by="name ASC")
-        for model in models:
-            self.model_combo.addItem(model['name'], model['id'])
+        """Заполнить списки промтов и моделей для фильтров."""
+        # Сигналы заблокированы: заполнение списков не должно запускать фильтрацию
+        # Промты
+        with QSignalBlocker(self.prompt_combo):
+            for prompt in self.prompts_dict.values():
+                date_str = prompt['date'][:10] if prompt['date'] else ""
+                display_text = f"{date_str}: {prompt['prompt'][:50]}..."
+                self.prompt_combo.addItem(display_text, prompt['id'])
+        
+        # Модели
+        with QSignalBlocker(self.model_combo):
+            for model in self.models_dict.values():
+                self.model_combo.addItem(model['name'], model['id'])
     
     def load_results(self):
-        """Загрузить все результаты из БД."""
-        self.all_results = self.db.get_results(order_by="created_at DESC")
+        """Загрузить все результаты из БД (в фоновом потоке, окно не блокируется)."""
+        if self._load_thread is not None and self._load_thread.isRunning():
+            # Загрузка уже идет - повторим ее после завершения, чтобы учесть изменения
+            self._reload_pending = True
+            return
         
-        # Загружаем информацию о промтах и моделях
-        self.prompts_dict = {}
-        prompts = self.db.get_prompts()
-        for prompt in prompts:
-            self.prompts_dict[prompt['id']] = prompt
+        self.load_progress.setVisible(True)
+        self._load_thread = ResultsLoadThread(self.db)
+        self._load_thread.loaded.connect(self.on_results_loaded)
+        self._load_thread.failed.connect(self.on_results_failed)
+        self._load_thread.start()
+    
+    def on_results_loaded(self, results: List[Dict], responses_lower: List[str],
+                          prompts: Dict[int, Dict], models: Dict[int, Dict]):
+        """Обработчик завершения загрузки результатов."""
+        # Поток отправил результат и завершается
+        self._load_thread.wait()
+        
+        self.all_results = results
+        self._responses_lower = responses_lower
+        self.prompts_dict = prompts
+        self.models_dict = models
+        if not self._filter_lists_loaded:
+            self._filter_lists_loaded = True
+            self.load_filter_lists()
+        self.apply_filters()
         
-        self.models_dict = {}
-        models = self.db.get_models()
-        for model in models:
-            self.models_dict[model['id']] = model
+        if self._reload_pending:
+            self._reload_pending = False
+            self.load_results()
+        else:
+            self.load_progress.setVisible(False)
+    
+    def on_results_failed(self, error: str):
+        """Обработчик ошибки загрузки результатов."""
+        self._load_thread.wait()
+        
+        if self._reload_pending:
+            # Данные могли измениться после начала загрузки - пробуем еще раз
+            self._reload_pending = False
+            self.load_results()
+            return
         
-        self.apply_filters()
+        self.load_progress.setVisible(False)
+        QMessageBox.critical(self, "Ошибка", f"Ошибка при загрузке результатов:\n{error}")
     
     def apply_filters(self):
         """Применить фильтры к результатам."""
-        filtered_results = self.all_results.copy()
-        
-        # Фильтр по поиску
+        self._search_timer.stop()
         search_text = self.search_input.text().strip().lower()
-        if search_text:
-            filtered_results = [
-                r for r in filtered_results
-                if search_text in r['response'].lower()
-            ]
-        
-        # Фильтр по промту
         prompt_id = self.prompt_combo.currentData()
-        if prompt_id:
-            filtered_results = [
-                r for r in filtered_results
-                if r['prompt_id'] == prompt_id
-            ]
-        
-        # Фильтр по модели
         model_id = self.model_combo.currentData()
-        if model_id:
+        
+        if not (search_text or prompt_id or model_id):
+            filtered_results = self.all_results
+        else:
+            # Один проход по результатам. Сначала дешевые сравнения ID,
+            # поиск подстроки выполняется только для прошедших их результатов
             filtered_results = [
-                r for r in filtered_results
-                if r['model_id'] == model_id
+                result
+                for result, response_lower in zip(self.all_results, self._responses_lower)
+                if (not prompt_id or result['prompt_id'] == prompt_id)
+                and (not model_id or result['model_id'] == model_id)
+                and (not search_text or search_text in response_lower)
             ]
         
         # Обновляем таблицу
@@ -199,80 +440,22 @@ class ViewResultsDialog(QDialog):
     
     def update_table(self, results):
         """Обновить таблицу результатов."""
-        self.results_table.setRowCount(len(results))
-        
-        for row, result in enumerate(results):
-            # Дата
-            date_str = result['created_at']
-            if date_str:
-                try:
-                    dt = datetime.strptime(date_str, "%Y-%m-%d %H:%M:%S")
-                    date_display = dt.strftime("%Y-%m-%d %H:%M")
-                except:
-                    date_display = date_str[:10]
-            else:
-                date_display = "N/A"
-            
-            date_item = QTableWidgetItem(date_display)
-            date_item.setData(Qt.UserRole, result['id'])  # Сохраняем ID
-            date_item.setFlags(date_item.flags() & ~Qt.ItemIsEditable)
-            self.results_table.setItem(row, 0, date_item)
-            
-            # Промт
-            prompt_id = result['prompt_id']
-            prompt_text = "N/A"
-            if prompt_id in self.prompts_dict:
-                prompt = self.prompts_dict[prompt_id]
-                prompt_text = prompt['prompt'][:80] + "..." if len(prompt['prompt']) > 80 else prompt['prompt']
-            
-            prompt_item = QTableWidgetItem(prompt_text)
-            prompt_item.setFlags(prompt_item.flags() & ~Qt.ItemIsEditable)
-            self.results_table.setItem(row, 1, prompt_item)
-            
-            # Модель
-            model_id = result['model_id']
-            model_name = "Unknown"
-            if model_id in self.models_dict:
-                model_name = self.models_dict[model_id]['name']
-            
-            model_item = QTableWidgetItem(model_name)
-            model_item.setFlags(model_item.flags() & ~Qt.ItemIsEditable)
-            self.results_table.setItem(row, 2, model_item)
-            
-            # Ответ (полный текст)
-            response_text = result['response']
-            response_item = QTableWidgetItem(response_text)
-            response_item.setFlags(response_item.flags() & ~Qt.ItemIsEditable)
-            response_item.setTextAlignment(Qt.AlignTop | Qt.AlignLeft)
-            # Сохраняем полный текст в пользовательских данных для просмотра
-            response_item.setData(Qt.UserRole + 1, response_text)
-            self.results_table.setItem(row, 3, response_item)
-            
-            # Добавляем обработчик двойного клика для просмотра полного текста
-            self.results_table.item(row, 3).setToolTip("Двойной клик для просмотра полного текста")
-            
-            # Кнопка удаления
-            delete_button = QPushButton("🗑️")
-            delete_button.setMaximumWidth(30)
-            delete_button.clicked.connect(
-                lambda checked, r_id=result['id']: self.delete_result(r_id)
-            )
-            self.results_table.setCellWidget(row, 4, delete_button)
-            
-            # Устанавливаем высоту строки (больше для лучшего отображения текста)
-            # Высота будет автоматически подстраиваться при включенном переносе текста
-            self.results_table.setRowHeight(row, 100)
-        
-        # Автоматически подгоняем ширину колонок
-        self.results_table.resizeColumnToContents(0)
-        self.results_table.resizeColumnToContents(1)
-        self.results_table.resizeColumnToContents(2)
+        # Ширину колонок подгоняет заголовок (режим ResizeToContents)
+        self.results_model.set_results(results)
+    
+    def done(self, result: int):
+        """Закрытие диалога: дождаться потока загрузки, чтобы он не был удален во время работы."""
+        if self._load_thread is not None:
+            self._load_thread.wait()
+        super().done(result)
     
     def clear_filters(self):
         """Очистить все фильтры."""
-        self.search_input.clear()
-        self.prompt_combo.setCurrentIndex(0)
-        self.model_combo.setCurrentIndex(0)
+        # Фильтры сбрасываются без промежуточных фильтраций, затем применяются один раз
+        with QSignalBlocker(self.prompt_combo), QSignalBlocker(self.model_combo):
+            self.search_input.clear()
+            self.prompt_combo.setCurrentIndex(0)
+            self.model_combo.setCurrentIndex(0)
         self.apply_filters()
     
     def delete_result(self, result_id: int):
@@ -295,9 +478,7 @@ class ViewResultsDialog(QDialog):
     
     def delete_selected(self):
         """Удалить выбранные результаты."""
-        selected_rows = set()
-        for item in self.results_table.selectedItems():
-            selected_rows.add(item.row())
+        selected_rows = self.results_table.selectionModel().selectedRows()
         
         if not selected_rows:
             QMessageBox.warning(self, "Ошибка", "Не выбрано ни одного результата!")
@@ -312,20 +493,12 @@ class ViewResultsDialog(QDialog):
         )
         
         if reply == QMessageBox.Yes:
-            deleted_count = 0
-            for row in selected_rows:
-                result_id_item = self.results_table.item(row, 0)
-                if result_id_item:
-                    result_id = result_id_item.data(Qt.UserRole)
-                    try:
-                        self.db.delete_result(result_id)
-                        deleted_count += 1
-                    except Exception as e:
-                        QMessageBox.warning(
-                            self,
-                            "Ошибка",
-                            f"Ошибка при удалении результата ID {result_id}: {str(e)}"
-                        )
+            result_ids = [self.results_model.result_at(index.row())['id'] for index in selected_rows]
+            try:
+                deleted_count = self.db.delete_results(result_ids)
+            except Exception as e:
+                QMessageBox.critical(self, "Ошибка", f"Ошибка при удалении: {str(e)}")
+                return
             
             if deleted_count > 0:
                 QMessageBox.information(
@@ -335,11 +508,12 @@ class ViewResultsDialog(QDialog):
                 )
                 self.load_results()
     
-    def view_full_response(self, item):
+    def view_full_response(self, index: QModelIndex):
         """Просмотр полного текста ответа в отдельном окне."""
-        # Проверяем, что клик был по колонке "Ответ" (индекс 3)
-        if item.column() == 3:
-            full_text = item.data(Qt.UserRole + 1) or item.text()
+        # Проверяем, что клик был по колонке "Ответ"
+        if index.column() == COLUMN_RESPONSE:
+            result = self.results_model.result_at(index.row())
+            full_text = result['response']
             
             # Создаем диалог для отображения полного текста
             dialog = QDialog(self)
@@ -350,7 +524,7 @@ class ViewResultsDialog(QDialog):
             dialog.setLayout(layout)
             
             # Метка с информацией
-            info_label = QLabel(f"Ответ модели: {self.results_table.item(item.row(), 2).text()}")
+            info_label = QLabel(f"Ответ модели: {result['_model_name']}")
             info_label.setFont(QFont("Arial", 10, QFont.Bold))
             layout.addWidget(info_label)
             
@@ -0,0 +1,49 @@
+"""
+Общие элементы таблиц диалогов: делегаты и форматирование ячеек.
+Используются диалогами промтов и результатов.
+"""
+from PyQt5.QtWidgets import QStyledItemDelegate, QStyle, QStyleOptionButton, QApplication
+from PyQt5.QtCore import Qt, QEvent, QSize, pyqtSignal
+
+
+def format_table_date(date_str: str) -> str:
+    """
+    Отформатировать дату из БД для ячейки таблицы.
+    
+    Args:
+        date_str: Дата в формате "YYYY-MM-DD HH:MM:SS" (так ее сохраняет Database)
+        
+    Returns:
+        Дата без секунд или "N/A"
+    """
+    return date_str[:16] if date_str else "N/A"
+
+
+class DeleteButtonDelegate(QStyledItemDelegate):
+    """Делегат, рисующий кнопку удаления в ячейке (без виджета на каждую строку)."""
+    
+    delete_requested = pyqtSignal(int)  # ID записи из Qt.UserRole
+    
+    BUTTON_HEIGHT = 32  # Высота кнопки, она центрируется в ячейке
+    
+    def paint(self, painter, option, index):
+        super().paint(painter, option, index)
+        button = QStyleOptionButton()
+        rect = option.rect.adjusted(4, 0, -4, 0)
+        rect.setHeight(min(self.BUTTON_HEIGHT, option.rect.height() - 8))
+        rect.moveCenter(option.rect.center())
+        button.rect = rect
+        button.text = "🗑️"
+        button.state = QStyle.State_Enabled
+        QApplication.style().drawControl(QStyle.CE_PushButton, button, painter)
+    
+    def sizeHint(self, option, index) -> QSize:
+        return QSize(40, option.rect.height())
+    
+    def editorEvent(self, event, model, option, index) -> bool:
+        if (event.type() == QEvent.MouseButtonRelease
+                and event.button() == Qt.LeftButton
+                and option.rect.contains(event.pos())):
+            self.delete_requested.emit(index.data(Qt.UserRole))
+            return True
+        return super().editorEvent(event, model, option, index)